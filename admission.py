@@ -0,0 +1,163 @@
+"""
+Admission control for the query endpoints
+Bounds the number of queries answered at once, queues a few more for a short
+time and rejects the rest right away, so overload sheds requests instead of
+slowing down every one of them
+"""
+
+import asyncio
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+
+
+class AdmissionRejected(Exception):
+    """Raised when a query is not admitted; carries the HTTP status and Retry-After"""
+
+    def __init__(self, reason, status_code, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Concurrency limit with a small fair-share wait queue
+
+    Up to max_concurrent queries run at once and up to max_queue wait for a
+    free slot, for at most queue_timeout seconds. Waiting queries are
+    admitted round-robin across users, so one busy user cannot starve the
+    others, and a user may hold at most max_per_user running or queued
+    queries (0 = no per-user limit). A query may take several slots (e.g. a
+    batch of questions answered concurrently). Rejections raise AdmissionRejected:
+    429 for a user over their limit, 503 when the queue is full or the wait
+    timed out.
+    """
+
+    def __init__(self, max_concurrent=16, max_queue=32, queue_timeout=5.0, max_per_user=0, retry_after=1):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_per_user = max_per_user
+        self.retry_after = retry_after
+        self.admitted = 0
+        self.rejected = Counter()
+        self._running = 0  # slots taken
+        self._active = Counter()  # running + queued queries per user
+        self._waiters = OrderedDict()  # user -> deque of (future, slots), in round-robin order
+        self._queued = 0
+
+    def _update_gauges(self):
+        ADMISSION_IN_FLIGHT.set(self._running)
+        ADMISSION_QUEUE_DEPTH.set(self._queued)
+
+    def _reject(self, reason, status_code):
+        self.rejected[reason] += 1
+        ADMISSION_REJECTED.inc(reason=reason)
+        raise AdmissionRejected(reason, status_code, self.retry_after)
+
+    def _leave(self, user):
+        self._active[user] -= 1
+        if self._active[user] <= 0:
+            del self._active[user]
+
+    def _dispatch(self):
+        """Hand free slots to waiting queries, one user at a time"""
+        while self._waiters:
+            user, waiters = next(iter(self._waiters.items()))
+            future, slots = waiters[0]
+            if not future.done() and self._running + slots > self.max_concurrent:
+                # Wait for enough free slots instead of letting smaller queries overtake
+                break
+            waiters.popleft()
+            if waiters:
+                self._waiters.move_to_end(user)
+            else:
+                del self._waiters[user]
+            self._queued -= 1
+            if not future.done():
+                self._running += slots
+                future.set_result(None)
+        self._update_gauges()
+
+    def _dequeue(self, user, future):
+        """Remove a waiter that gave up"""
+        waiters = self._waiters.get(user)
+        entry = next((entry for entry in waiters or () if entry[0] is future), None)
+        if entry:
+            waiters.remove(entry)
+            self._queued -= 1
+            if not waiters:
+                del self._waiters[user]
+            # A waiter at the head may have held back the others
+            self._dispatch()
+        self._update_gauges()
+
+    async def acquire(self, user, slots=1):
+        """Wait for free slots, or raise AdmissionRejected"""
+        slots = min(slots, self.max_concurrent)
+        if self.max_per_user and self._active[user] >= self.max_per_user:
+            self._reject("user_limit", 429)
+        if self._running + slots <= self.max_concurrent and not self._queued:
+            self._running += slots
+        else:
+            if self._queued >= self.max_queue:
+                self._reject("queue_full", 503)
+            await self._wait(user, slots)
+        self._active[user] += 1
+        self.admitted += 1
+        self._update_gauges()
+
+    async def _wait(self, user, slots):
+        """Queue until the slots are handed over or queue_timeout passes"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user, deque()).append((future, slots))
+        self._queued += 1
+        # Queued queries count towards the user's limit too
+        self._active[user] += 1
+        self._update_gauges()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._dequeue(user, future)
+            self._reject("queue_timeout", 503)
+        except asyncio.CancelledError:
+            # The client went away: give back a slot granted in the meantime
+            if future.done() and not future.cancelled():
+                self._running -= slots
+                self._dispatch()
+            self._dequeue(user, future)
+            raise
+        finally:
+            self._leave(user)
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+    def release(self, user, slots=1):
+        """Free the slots of a finished query"""
+        self._running -= min(slots, self.max_concurrent)
+        self._leave(user)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, user, slots=1):
+        """Hold slots for the duration of the block"""
+        await self.acquire(user, slots)
+        try:
+            yield
+        finally:
+            self.release(user, slots)
+
+    def stats(self):
+        """Return limits, current load and rejection counts"""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "max_per_user": self.max_per_user,
+            "in_flight": self._running,
+            "queued": self._queued,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected)
+        }
@@ -0,0 +1,94 @@
+"""
+Semantic answer cache
+Reuses generated answers for repeated and near-duplicate questions when the
+retrieved documents are the same
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    def __init__(self, similarity_threshold=0.97, ttl_seconds=3600, max_entries=1000):
+        """Create an empty in-memory answer cache"""
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding):
+        """Convert an embedding to a unit-length float32 vector"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now):
+        """Drop entries older than the TTL"""
+        expired = [
+            key for key, entry in self._entries.items()
+            if now - entry["created_at"] > self.ttl_seconds
+        ]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, query_embedding, doc_ids):
+        """Return a cached answer for a similar query with the same documents, or None"""
+        doc_ids = tuple(doc_ids)
+        with self._lock:
+            self._expire(time.time())
+
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if entry["doc_ids"] == doc_ids
+            ]
+            if candidates:
+                vectors = np.stack([entry["vector"] for _, entry in candidates])
+                similarities = vectors @ self._normalize(query_embedding)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry["answer"]
+
+            self.misses += 1
+            return None
+
+    def store(self, query_embedding, doc_ids, answer):
+        """Cache an answer for a query embedding and its retrieved documents"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[self._next_key] = {
+                "vector": self._normalize(query_embedding),
+                "doc_ids": tuple(doc_ids),
+                "answer": answer,
+                "created_at": time.time()
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Invalidate all cached answers (e.g. after documents are re-ingested)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and cache size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries
+        }
@@ -3,26 +3,46 @@ FastAPI application for Sauce Recipe RAG System
 Provides REST API endpoints for querying sauce recipes
 """
 
-from fastapi import FastAPI, HTTPException, Query, Depends, status
+from fastapi import FastAPI, HTTPException, Query, Depends, Request, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 import uvicorn
-from typing import Optional
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+import asyncio
 import logging
 import os
+import json
+import time
 import secrets
 import hashlib
 
-# Try to import RAG system components
-try:
-    from rag_system import SimpleRAGSystem
-    from sample_documents import SAMPLE_DOCUMENTS
-    RAG_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: RAG system not available: {e}")
-    RAG_AVAILABLE = False
-    SimpleRAGSystem = None
-    SAMPLE_DOCUMENTS = []
+from dotenv import load_dotenv
+from admission import AdmissionController, AdmissionRejected
+from file_lock import FileLock
+from metrics import HTTP_REQUEST_SECONDS, REGISTRY, span, start_request_timings
+from ingest import INGEST_LOCK_PATH
+from query_log import QueryLog
+from recipe_attributes import build_where
+from singleflight import SingleFlight
+
+# Load environment variables (credentials are checked before rag_system is imported)
+load_dotenv()
+
+# RAG system components (and their heavy dependencies: openai, numpy,
+# chromadb) are imported by the background startup task, so the server
+# starts answering health checks right away. None until the import was tried.
+RAG_AVAILABLE = None
+SimpleRAGSystem = None
+AnswerStreamError = None
+SAMPLE_DOCUMENTS = []
+normalize_text = None
+
+# Metrics are added up across worker processes through this directory ("" = per process)
+METRICS_DIR = os.getenv("METRICS_DIR", "./cache/metrics")
+if METRICS_DIR:
+    REGISTRY.share(METRICS_DIR, interval=float(os.getenv("METRICS_FLUSH_SECONDS", "5")))
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -73,16 +93,147 @@ app = FastAPI(
 rag_system = None
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the RAG system on startup"""
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Export the latency of every request to /metrics"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, not the raw path, to keep label values bounded
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        path=route.path if route else "unmatched",
+        status=response.status_code
+    )
+    return response
+
+# With several workers only the one holding the ingestion lock syncs the
+# recipes; the others wait for it and open the index read-only. Set to false
+# when ingestion runs as a separate step (python ingest.py).
+INGEST_ON_STARTUP = os.getenv("INGEST_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Progress of the background startup, reported by /ready
+startup_state = {
+    "status": "starting",
+    "role": None,
+    "detail": None,
+    "documents_done": 0,
+    "documents_total": 0,
+    "started_at": time.time(),
+    "ready_at": None,
+    "warmup": None
+}
+startup_task = None
+
+# Example questions, shown by / and used to warm up new workers
+EXAMPLE_QUERIES = [
+    "Jak zrobić sos czosnkowy?",
+    "Jaki sos pasuje do ryby?",
+    "Potrzebuję przepisu na sos do makaronu",
+    "Jakie sosy są idealne do grilla?"
+]
+
+# Warmup before a worker reports ready: open upstream connections, embed
+# popular questions and run retrievals so the first users don't pay for it
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+WARMUP_QUERIES_FILE = os.getenv("WARMUP_QUERIES_FILE")
+WARMUP_POPULAR_QUERIES = int(os.getenv("WARMUP_POPULAR_QUERIES", "20"))
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "4"))
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "30"))
+
+# Questions asked, counted for the warmup of the next workers
+query_log = QueryLog(path=os.getenv("QUERY_LOG_PATH", "./cache/query_log.json") or None)
+
+# Identical in-flight /query requests share one search and answer
+query_flight = SingleFlight()
+
+# Admission control for the query endpoints: answered at once, waiting, and for how long
+query_admission = AdmissionController(
+    max_concurrent=int(os.getenv("QUERY_MAX_CONCURRENCY", "16")),
+    max_queue=int(os.getenv("QUERY_MAX_QUEUE", "32")),
+    queue_timeout=float(os.getenv("QUERY_QUEUE_TIMEOUT_SECONDS", "5")),
+    max_per_user=int(os.getenv("QUERY_MAX_PER_USER", "0")),
+    retry_after=int(os.getenv("QUERY_RETRY_AFTER_SECONDS", "1"))
+)
+
+# Batch query limits
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "50"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+
+class BatchQueryRequest(BaseModel):
+    """Request body for /query/batch"""
+    queries: List[str]
+    max_results: int = 3
+    mode: Optional[str] = None
+    filters: Optional[Dict[str, str]] = None
+
+
+def import_rag_components():
+    """Import the RAG system modules (blocking, runs in a worker thread)"""
+    global RAG_AVAILABLE, SimpleRAGSystem, AnswerStreamError, SAMPLE_DOCUMENTS, normalize_text
+    try:
+        from embedding_cache import normalize_text
+        from rag_system import AnswerStreamError, SimpleRAGSystem
+        from sample_documents import SAMPLE_DOCUMENTS
+        RAG_AVAILABLE = True
+    except ImportError as e:
+        print(f"Warning: RAG system not available: {e}")
+        RAG_AVAILABLE = False
+
+
+def report_ingestion_progress(done, total):
+    """Progress callback for document ingestion"""
+    startup_state["documents_done"] = done
+    startup_state["documents_total"] = total
+
+
+def warmup_queries():
+    """Questions to warm up with: configured, from WARMUP_QUERIES_FILE and the most popular"""
+    queries = os.getenv("WARMUP_QUERIES", "|".join(EXAMPLE_QUERIES)).split("|")
+    if WARMUP_QUERIES_FILE:
+        try:
+            with open(WARMUP_QUERIES_FILE, encoding="utf-8") as f:
+                queries.extend(f.read().splitlines())
+        except OSError as e:
+            logger.warning(f"Could not read WARMUP_QUERIES_FILE: {e}")
+    if WARMUP_POPULAR_QUERIES > 0:
+        queries.extend(query_log.popular(WARMUP_POPULAR_QUERIES))
+    # Drop blanks and duplicates, keeping the order
+    return list(dict.fromkeys(q.strip() for q in queries if q.strip()))
+
+
+async def warm_up(system):
+    """Run the warmup phase, returning its statistics"""
+    startup_state["status"] = "warming_up"
+    queries = await asyncio.to_thread(warmup_queries)
+    logger.info(f"Warming up with {len(queries)} queries...")
+    start_time = time.perf_counter()
+    try:
+        with span("warmup"):
+            stats = await asyncio.wait_for(
+                system.awarmup(queries, connections=WARMUP_CONNECTIONS), WARMUP_TIMEOUT_SECONDS
+            )
+    except asyncio.TimeoutError:
+        logger.warning(f"Warmup did not finish within {WARMUP_TIMEOUT_SECONDS}s")
+        stats = {"queries": len(queries), "timed_out": True,
+                 "seconds": round(time.perf_counter() - start_time, 3)}
+    logger.info(f"Warmup finished in {stats['seconds']}s")
+    return stats
+
+
+async def initialize_rag_system():
+    """Import, build and sync the RAG system in the background"""
     global rag_system
-    logger.info("App starting up...")
-    
+    startup_state["status"] = "loading"
+    await asyncio.to_thread(import_rag_components)
+
     if not RAG_AVAILABLE:
         logger.warning("RAG system dependencies not available - running in limited mode")
+        startup_state.update(status="unavailable", detail="RAG system dependencies not available")
         return
-    
+
     try:
         logger.info("Initializing Sauce Recipe RAG System...")
         
@@ -90,19 +241,57 @@ async def startup_event():
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             logger.warning("OPENAI_API_KEY not found - RAG system will be limited")
+            startup_state.update(status="unavailable", detail="OPENAI_API_KEY not set")
             return
             
-        rag_system = SimpleRAGSystem()
-        
-        # Add sauce recipes to the system
-        logger.info("Loading sauce recipes...")
-        rag_system.add_documents(SAMPLE_DOCUMENTS)
+        lock = FileLock(INGEST_LOCK_PATH)
+        if INGEST_ON_STARTUP and await asyncio.to_thread(lock.acquire, False):
+            # This worker is the ingestion leader
+            startup_state["role"] = "leader"
+            try:
+                system = await asyncio.to_thread(SimpleRAGSystem)
+                # Queries are served from the existing index while the sync runs
+                rag_system = system
+                
+                # Sync sauce recipes with the collection (only new or changed recipes are embedded)
+                logger.info("Loading sauce recipes...")
+                startup_state["status"] = "ingesting"
+                await asyncio.to_thread(
+                    system.sync_documents, SAMPLE_DOCUMENTS, progress=report_ingestion_progress
+                )
+            finally:
+                lock.release()
+        else:
+            # Wait until the leader (or ingest.py) has finished, then open the index read-only
+            startup_state.update(role="reader", status="waiting_for_ingestion")
+            await asyncio.to_thread(lock.acquire)
+            lock.release()
+            startup_state["status"] = "loading"
+            rag_system = await asyncio.to_thread(SimpleRAGSystem, read_only=True)
         
+        if WARMUP_ENABLED:
+            startup_state["warmup"] = await warm_up(rag_system)
+        startup_state.update(status="ready", ready_at=time.time())
         logger.info("RAG System initialized successfully!")
     except Exception as e:
         logger.error(f"Failed to initialize RAG system: {e}")
-        # Don't raise - let the app start anyway for health checks
-        logger.warning("App starting without RAG system - some endpoints may not work")
+        startup_state.update(status="failed", detail=str(e))
+        logger.warning("App running without a fully initialized RAG system - some endpoints may not work")
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Start initializing the RAG system without blocking startup"""
+    global startup_task
+    logger.info("App starting up...")
+    # Don't wait for it - the app serves health checks while the system loads
+    startup_task = asyncio.create_task(initialize_rag_system())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Save the counts of the questions asked for the next warmup"""
+    await asyncio.to_thread(query_log.save)
 
 
 @app.get("/")
@@ -114,23 +303,129 @@ async def root():
         "status": "Protected API - Authentication required",
         "endpoints": {
             "query": "/query?q=your_question (🔒 Protected)",
+            "query_stream": "/query/stream?q=your_question (🔒 Protected, server-sent events)",
+            "query_batch": "POST /query/batch {\"queries\": [...]} (🔒 Protected)",
             "docs": "/docs (🔒 Protected)",
-            "health": "/health (Public)"
+            "health": "/health (Public)",
+            "ready": "/ready (Public, 503 until recipes are loaded and the worker is warmed up)",
+            "metrics": "/metrics (🔒 Protected, Prometheus format)"
         },
         "authentication": "HTTP Basic Auth required for protected endpoints",
-        "example_queries": [
-            "Jak zrobić sos czosnkowy?",
-            "Jaki sos pasuje do ryby?",
-            "Potrzebuję przepisu na sos do makaronu",
-            "Jakie sosy są idealne do grilla?"
-        ]
+        "example_queries": EXAMPLE_QUERIES
     }
 
 
+def format_recipes(search_results):
+    """Format ChromaDB search results as a list of retrieved recipes"""
+    retrieved_recipes = []
+    for i, (doc, metadata, distance) in enumerate(zip(
+        search_results['documents'][0],
+        search_results['metadatas'][0],
+        search_results['distances'][0]
+    )):
+        retrieved_recipes.append({
+            "rank": i + 1,
+            "recipe_id": metadata.get('source', f"recipe_{i}"),
+            "content": doc,
+            "sauce_type": metadata.get('sauce_type'),
+            "served": metadata.get('served'),
+            "pairings": [p for p in metadata.get('pairings', "").split(",") if p],
+            "ingredients": [p for p in metadata.get('ingredients', "").split(",") if p],
+            # Convert distance to similarity (lexical-only matches have no distance)
+            "similarity_score": round(1 - distance, 4) if distance is not None else None
+        })
+    return retrieved_recipes
+
+
+def check_rag_system():
+    """Raise 503 unless the RAG system is loaded"""
+    if RAG_AVAILABLE is False:
+        raise HTTPException(status_code=503, detail="RAG system dependencies not available")
+    if not rag_system:
+        raise HTTPException(status_code=503, detail="RAG system not initialized")
+
+
+def parse_filters(filters):
+    """Build the where clause of recipe attribute filters, 400 if they are invalid"""
+    try:
+        return build_where(filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def no_recipes_answer(where):
+    """Answer to a question without any retrieved recipes"""
+    if where:
+        return "No recipes match the filters."
+    return "No relevant recipes found."
+
+
+def no_recipes_response(q, search_results, where=None):
+    """Response for a question without any retrieved recipes
+
+    An empty result is a valid answer (200), unless the query could not be
+    embedded and the lexical fallback found nothing (503).
+    """
+    if search_results["degraded"]:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "error": "No relevant recipes found",
+                "message": "This might be due to API quota issues or connection problems",
+                "query": q
+            }
+        )
+    return JSONResponse(content=query_response(q, search_results, {
+        "answer": no_recipes_answer(where), "cached": False, "degraded": False, "context_tokens": 0
+    }))
+
+
+def query_response(q, search_results, result=None):
+    """Response fields of a question: the answer (a generate_answer_cached result) and recipes"""
+    retrieved_recipes = format_recipes(search_results)
+    content = {"query": q}
+    if result is not None:
+        content.update({
+            "answer": result["answer"],
+            "cached": result["cached"],
+            "degraded": result["degraded"] or search_results["degraded"],
+            "context_tokens": result["context_tokens"]
+        })
+    content.update({
+        "retrieval_mode": search_results["retrieval_mode"],
+        "retrieved_recipes": retrieved_recipes,
+        "total_recipes_found": len(retrieved_recipes)
+    })
+    return content
+
+
+async def admit_query(user, slots=1):
+    """Take query slots, or raise 503/429 with Retry-After under overload"""
+    try:
+        await query_admission.acquire(user, slots)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"Too many queries, try again later ({e.reason})",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+def sse_event(event, data):
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @app.get("/query")
 async def query_sauce_recipes(
     q: str = Query(..., description="Your question about sauce recipes in Polish"),
     max_results: Optional[int] = Query(3, description="Maximum number of recipes to retrieve", ge=1, le=10),
+    mode: Optional[str] = Query(None, description="Retrieval mode: hybrid, vector or lexical", pattern="^(hybrid|vector|lexical)$"),
+    sauce_type: Optional[str] = Query(None, description="Only recipes of this sauce type, e.g. jogurtowy, pomidorowy"),
+    served: Optional[str] = Query(None, description="Only recipes served hot or cold", pattern="^(hot|cold)$"),
+    pairing: Optional[str] = Query(None, description="Only recipes pairing with this dish, e.g. ryby, makaron"),
+    ingredient: Optional[str] = Query(None, description="Only recipes with these ingredients (comma-separated), e.g. czosnek"),
+    timings: bool = Query(False, description="Include per-stage timings in the response"),
     current_user: str = Depends(verify_credentials)
 ):
     """
@@ -138,57 +433,49 @@ async def query_sauce_recipes(
     
     - **q**: Your question about sauce recipes (preferably in Polish)
     - **max_results**: Number of relevant recipes to retrieve (1-10, default: 3)
+    - **mode**: Retrieval mode - hybrid (default), vector or lexical (no embedding request)
+    - **sauce_type**, **served**, **pairing**, **ingredient**: Filters on recipe attributes
+    - **timings**: Include per-stage timings in milliseconds (default: false)
     
-    Returns relevant sauce recipes and an AI-generated answer.
+    Returns relevant sauce recipes and an AI-generated answer. While OpenAI
+    is failing the response is flagged `degraded`: recipes are retrieved
+    lexically and `answer` is null once the completion circuit is open.
+    Under overload queries wait briefly for a free slot and are otherwise
+    rejected with 503 (or 429 for a user over their limit) and Retry-After.
     """
-    if not RAG_AVAILABLE:
-        raise HTTPException(status_code=503, detail="RAG system dependencies not available")
-    
-    if not rag_system:
-        raise HTTPException(status_code=503, detail="RAG system not initialized")
+    check_rag_system()
     
     if not q.strip():
         raise HTTPException(status_code=400, detail="Query parameter 'q' cannot be empty")
     
+    where = parse_filters(
+        {"sauce_type": sauce_type, "served": served, "pairing": pairing, "ingredient": ingredient}
+    )
+    
+    start_time = time.perf_counter()
+    await admit_query(current_user)
     try:
         logger.info(f"Processing query: {q}")
+        query_log.record(q)
         
-        # Search for relevant recipes
-        search_results = rag_system.search_documents(q, n_results=max_results)
-        
-        if not search_results['documents'][0]:
-            return JSONResponse(
-                status_code=503,
-                content={
-                    "error": "No relevant recipes found",
-                    "message": "This might be due to API quota issues or connection problems",
-                    "query": q
-                }
-            )
-        
-        # Generate answer
-        answer = rag_system.generate_answer(q, search_results['documents'][0])
+        # Concurrent identical questions wait on the same search and answer
+        key = (normalize_text(q), max_results, mode or rag_system.retrieval_mode, json.dumps(where, sort_keys=True))
+        search_results, result, stage_timings = await query_flight.do(
+            key, answer_query, q, max_results, mode, where
+        )
         
-        # Format response
-        retrieved_recipes = []
-        for i, (doc, metadata, distance) in enumerate(zip(
-            search_results['documents'][0],
-            search_results['metadatas'][0],
-            search_results['distances'][0]
-        )):
-            retrieved_recipes.append({
-                "rank": i + 1,
-                "recipe_id": metadata.get('source', f"recipe_{i}"),
-                "content": doc,
-                "similarity_score": round(1 - distance, 4)  # Convert distance to similarity
-            })
+        if result is None:
+            return no_recipes_response(q, search_results, where)
         
-        return {
-            "query": q,
-            "answer": answer,
-            "retrieved_recipes": retrieved_recipes,
-            "total_recipes_found": len(retrieved_recipes)
-        }
+        # Format and serialize the response
+        with span("serialization"):
+            content = query_response(q, search_results, result)
+            if timings:
+                content["timings"] = {
+                    **stage_timings,
+                    "total_ms": round((time.perf_counter() - start_time) * 1000, 2)
+                }
+            return JSONResponse(content=content)
         
     except Exception as e:
         logger.error(f"Error processing query '{q}': {e}")
@@ -196,6 +483,229 @@ async def query_sauce_recipes(
             status_code=500, 
             detail=f"Internal server error while processing query: {str(e)}"
         )
+    finally:
+        query_admission.release(current_user)
+
+
+async def answer_query(q, max_results, mode, where=None):
+    """Search for recipes and generate an answer (None if nothing was found)
+
+    Also returns the stage timings, shared with coalesced requests.
+    """
+    stage_timings = start_request_timings()
+    search_results = await rag_system.asearch_documents(q, n_results=max_results, mode=mode, where=where)
+    if not search_results['documents'][0]:
+        return search_results, None, stage_timings
+    result = await rag_system.agenerate_answer_cached(q, search_results)
+    return search_results, result, stage_timings
+
+
+@app.post("/query/batch")
+async def batch_query_sauce_recipes(
+    request: BatchQueryRequest,
+    current_user: str = Depends(verify_credentials)
+):
+    """
+    Query the sauce recipe knowledge base with many questions at once
+    
+    - **queries**: List of questions (1-BATCH_MAX_QUERIES, default 50)
+    - **max_results**: Number of relevant recipes to retrieve per question (1-10, default: 3)
+    - **mode**: Retrieval mode - hybrid (default), vector or lexical (no embedding request)
+    - **filters**: Filters on recipe attributes applied to all questions, e.g. {"pairing": "ryby"}
+    
+    All questions are embedded in one request and searched in one vector
+    store query; answers are generated concurrently. A failed question gets
+    an `error` field instead of failing the whole batch. The batch takes as
+    many admission slots as answers it generates at once.
+    """
+    check_rag_system()
+    
+    queries = [q.strip() for q in request.queries]
+    if not queries or len(queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"'queries' must contain 1 to {BATCH_MAX_QUERIES} questions")
+    if any(not q for q in queries):
+        raise HTTPException(status_code=400, detail="Queries cannot be empty")
+    if not 1 <= request.max_results <= 10:
+        raise HTTPException(status_code=400, detail="'max_results' must be between 1 and 10")
+    if request.mode is not None and request.mode not in ("hybrid", "vector", "lexical"):
+        raise HTTPException(status_code=400, detail="'mode' must be hybrid, vector or lexical")
+    where = parse_filters(request.filters)
+
+    # As many slots as answers generated at once
+    slots = min(len(queries), BATCH_MAX_CONCURRENCY)
+    await admit_query(current_user, slots)
+    try:
+        return await answer_batch(queries, request.max_results, request.mode, where)
+    finally:
+        query_admission.release(current_user, slots)
+
+
+async def answer_batch(queries, max_results, mode, where):
+    """Search for and answer a batch of questions"""
+    logger.info(f"Processing batch of {len(queries)} queries")
+    for q in queries:
+        query_log.record(q)
+
+    try:
+        all_results = await rag_system.asearch_documents_batch(
+            queries, n_results=max_results, mode=mode, where=where
+        )
+    except Exception as e:
+        logger.error(f"Error processing query batch: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error while processing query batch: {str(e)}"
+        )
+
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+    async def answer(q, search_results):
+        if not search_results['documents'][0]:
+            if search_results["degraded"]:
+                return {"query": q, "error": "No relevant recipes found"}
+            return query_response(q, search_results, {
+                "answer": no_recipes_answer(where), "cached": False, "degraded": False, "context_tokens": 0
+            })
+        try:
+            async with semaphore:
+                result = await rag_system.agenerate_answer_cached(q, search_results)
+        except Exception as e:
+            logger.error(f"Error processing query '{q}': {e}")
+            return {"query": q, "error": str(e)}
+
+        return query_response(q, search_results, result)
+
+    results = await asyncio.gather(*(
+        answer(q, search_results) for q, search_results in zip(queries, all_results)
+    ))
+
+    return {
+        "results": results,
+        "total_queries": len(results),
+        "failed": sum(1 for result in results if "error" in result)
+    }
+
+
+@app.get("/query/stream")
+async def stream_sauce_recipes(
+    q: str = Query(..., description="Your question about sauce recipes in Polish"),
+    max_results: Optional[int] = Query(3, description="Maximum number of recipes to retrieve", ge=1, le=10),
+    mode: Optional[str] = Query(None, description="Retrieval mode: hybrid, vector or lexical", pattern="^(hybrid|vector|lexical)$"),
+    sauce_type: Optional[str] = Query(None, description="Only recipes of this sauce type, e.g. jogurtowy, pomidorowy"),
+    served: Optional[str] = Query(None, description="Only recipes served hot or cold", pattern="^(hot|cold)$"),
+    pairing: Optional[str] = Query(None, description="Only recipes pairing with this dish, e.g. ryby, makaron"),
+    ingredient: Optional[str] = Query(None, description="Only recipes with these ingredients (comma-separated), e.g. czosnek"),
+    current_user: str = Depends(verify_credentials)
+):
+    """
+    Query the sauce recipe knowledge base and stream the answer (server-sent events)
+    
+    - **q**: Your question about sauce recipes (preferably in Polish)
+    - **max_results**: Number of relevant recipes to retrieve (1-10, default: 3)
+    - **mode**: Retrieval mode - hybrid (default), vector or lexical (no embedding request)
+    - **sauce_type**, **served**, **pairing**, **ingredient**: Filters on recipe attributes
+    
+    Emits a `recipes` event with the retrieved recipes, `token` events with
+    answer text as it is generated and a final `done` event with timings.
+    The admission slot is held until the stream ends.
+    """
+    check_rag_system()
+    
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query parameter 'q' cannot be empty")
+
+    where = parse_filters(
+        {"sauce_type": sauce_type, "served": served, "pairing": pairing, "ingredient": ingredient}
+    )
+
+    start_time = time.perf_counter()
+    await admit_query(current_user)
+    released = False
+
+    def release():
+        # Called from the stream and from the response background task, whichever runs
+        nonlocal released
+        if not released:
+            released = True
+            query_admission.release(current_user)
+
+    try:
+        logger.info(f"Processing streaming query: {q}")
+        query_log.record(q)
+        search_results = await rag_system.asearch_documents(q, n_results=max_results, mode=mode, where=where)
+    except Exception as e:
+        release()
+        logger.error(f"Error processing query '{q}': {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error while processing query: {str(e)}"
+        )
+    except BaseException:
+        release()
+        raise
+
+    found = bool(search_results['documents'][0])
+    if not found and search_results["degraded"]:
+        release()
+        return no_recipes_response(q, search_results, where)
+
+    retrieval_time = time.perf_counter() - start_time
+
+    async def event_stream():
+        try:
+            async for event in answer_events():
+                yield event
+        finally:
+            release()
+
+    async def answer_events():
+        yield sse_event("recipes", query_response(q, search_results))
+
+        first_token_time = None
+        context_tokens = 0
+        degraded = search_results["degraded"]
+        cached_answer = rag_system.get_cached_answer(search_results) if found else None
+        if not found:
+            yield sse_event("token", {"text": no_recipes_answer(where)})
+        elif cached_answer is not None:
+            first_token_time = time.perf_counter() - start_time
+            yield sse_event("token", {"text": cached_answer})
+        elif rag_system.chat_breaker.is_open:
+            # Recipes only, no answer while the completion circuit is open
+            degraded = True
+        else:
+            packed = rag_system.pack_context(search_results['documents'][0])
+            context_tokens = packed["tokens"]
+            tokens = []
+            try:
+                async for token in rag_system.astream_answer(q, packed["documents"], packed=True):
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter() - start_time
+                    tokens.append(token)
+                    yield sse_event("token", {"text": token})
+            except AnswerStreamError as e:
+                # Only answers that streamed to the end are cached
+                yield sse_event("token", {"text": str(e)})
+            else:
+                rag_system.cache_answer(search_results, "".join(tokens).strip())
+
+        total_time = time.perf_counter() - start_time
+        yield sse_event("done", {
+            "cached": cached_answer is not None,
+            "degraded": degraded,
+            "context_tokens": context_tokens,
+            "retrieval_ms": round(retrieval_time * 1000, 1),
+            "first_token_ms": round(first_token_time * 1000, 1) if first_token_time is not None else None,
+            "total_ms": round(total_time * 1000, 1)
+        })
+
+    # The background task also runs when the client disconnects before the stream starts
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release)
+    )
 
 
 @app.get("/health")
@@ -204,6 +714,29 @@ async def health_check():
     return {"status": "ok", "app": "running"}
 
 
+@app.get("/metrics")
+async def metrics(current_user: str = Depends(verify_credentials)):
+    """Prometheus metrics - Protected
+
+    Stage latency histograms, OpenAI token usage and HTTP request latency.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check - Public endpoint
+
+    Returns 200 once the RAG system is built, the recipes are synced and
+    the worker is warmed up, 503 with the startup progress before that.
+    """
+    state = dict(startup_state)
+    state["uptime_seconds"] = round(time.time() - state["started_at"], 1)
+    if state["status"] != "ready":
+        return JSONResponse(status_code=503, content=state)
+    return state
+
+
 @app.get("/test")
 async def test_endpoint(current_user: str = Depends(verify_credentials)):
     """Simple test endpoint - Protected"""
@@ -213,7 +746,26 @@ async def test_endpoint(current_user: str = Depends(verify_credentials)):
         "port": os.getenv("PORT", "8000"),
         "openai_key_set": bool(os.getenv("OPENAI_API_KEY")),
         "rag_available": RAG_AVAILABLE,
-        "rag_system_initialized": rag_system is not None
+        "rag_system_initialized": rag_system is not None,
+        "embedding_model": rag_system.embedding_model if rag_system else None,
+        "embedding_cache": (
+            rag_system.embedding_cache.stats()
+            if rag_system and rag_system.embedding_cache else None
+        ),
+        "answer_cache": (
+            rag_system.answer_cache.stats()
+            if rag_system and rag_system.answer_cache else None
+        ),
+        "query_coalescing": query_flight.stats(),
+        "query_admission": query_admission.stats(),
+        "circuit_breakers": {
+            "embeddings": rag_system.embedding_breaker.stats(),
+            "chat": rag_system.chat_breaker.stats()
+        } if rag_system else None,
+        "rate_limits": {
+            "embeddings": rag_system.embedding_limiter.stats(),
+            "chat": rag_system.chat_limiter.stats()
+        } if rag_system else None
     }
 
 
@@ -225,6 +777,6 @@ if __name__ == "__main__":
         "api:app",
         host="0.0.0.0",
         port=port,
-        reload=True,
+        workers=int(os.getenv("WEB_CONCURRENCY", 1)),
         log_level="info"
     )
\ No newline at end of file
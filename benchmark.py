@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the RAG system against the fake OpenAI server
+Generates synthetic Polish recipe corpora and reports ingestion rate, query
+latency percentiles and memory as JSON, so results can be compared across
+versions
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+SAUCES = [
+    "czosnkowy", "pomidorowy", "grzybowy", "koperkowy", "chrzanowy", "musztardowy",
+    "śmietanowy", "serowy", "paprykowy", "miodowo-musztardowy", "ziołowy", "cebulowy",
+    "jogurtowy", "pieczeniowy", "cytrynowy", "orzechowy", "żurawinowy", "ogórkowy"
+]
+INGREDIENTS = [
+    "jogurtu greckiego", "śmietany 18%", "masła", "mąki pszennej", "bulionu warzywnego",
+    "pomidorów z puszki", "pieczarek", "koperku", "natki pietruszki", "czosnku", "cebuli",
+    "musztardy dijon", "miodu", "soku z cytryny", "oliwy z oliwek", "parmezanu",
+    "papryki słodkiej", "chrzanu", "żurawiny", "orzechów włoskich", "białego wina"
+]
+DISHES = [
+    "ryby", "makaronu", "grillowanego mięsa", "pierogów", "ziemniaków", "kurczaka",
+    "warzyw", "sałatek", "kotletów", "placków ziemniaczanych", "klopsików", "schabu"
+]
+STEPS = [
+    "Rozgrzej {a} w rondlu i dodaj {b}.",
+    "Wymieszaj {a} z {b} i dopraw solą oraz pieprzem.",
+    "Gotuj na małym ogniu przez {n} minut, często mieszając.",
+    "Dodaj {a} i zagotuj, a następnie zmniejsz ogień.",
+    "Odstaw na {n} minut do lodówki, aby smaki się przegryzły.",
+    "Na koniec dodaj {a} i zblenduj na gładką masę.",
+    "Podawaj na ciepło lub na zimno."
+]
+
+
+def generate_corpus(n_docs, seed=0):
+    """Yield synthetic Polish sauce recipes"""
+    rng = random.Random(seed)
+    for i in range(n_docs):
+        sauce = rng.choice(SAUCES)
+        ingredients = rng.sample(INGREDIENTS, 4)
+        steps = [
+            step.format(a=rng.choice(ingredients), b=rng.choice(ingredients), n=rng.randint(2, 30))
+            for step in rng.sample(STEPS, 4)
+        ]
+        amounts = ", ".join(f"{rng.randint(1, 300)} g {ingredient}" for ingredient in ingredients)
+        yield {
+            "id": f"synthetic-{i}",
+            "content": f"Sos {sauce} nr {i}: Potrzebujesz {amounts}. {' '.join(steps)} "
+                       f"Świetnie pasuje do {rng.choice(DISHES)}."
+        }
+
+
+def generate_queries(n_queries, seed=1):
+    """Synthetic questions about the recipes"""
+    rng = random.Random(seed)
+    templates = [
+        "Jak zrobić sos {sauce}?",
+        "Jaki sos pasuje do {dish}?",
+        "Potrzebuję przepisu na sos z {ingredient}",
+        "Sos {sauce} do {dish}",
+    ]
+    return [
+        rng.choice(templates).format(
+            sauce=rng.choice(SAUCES), dish=rng.choice(DISHES), ingredient=rng.choice(INGREDIENTS)
+        )
+        for _ in range(n_queries)
+    ]
+
+
+def rss_mb():
+    """Current resident memory of this process in MB (Linux only)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(latencies, seconds):
+    """Latency percentiles in ms and throughput"""
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "requests_per_sec": round(len(latencies) / seconds, 2) if seconds > 0 else 0.0
+    }
+
+
+async def run_concurrently(func, items, concurrency):
+    """Call func(item) for all items with bounded concurrency, returning latencies in ms and wall time"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed(item):
+        async with semaphore:
+            start = time.perf_counter()
+            await func(item)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(item) for item in items))
+    return latencies, time.perf_counter() - start
+
+
+async def benchmark_queries(rag, queries, concurrency):
+    """Query latency through SimpleRAGSystem (retrieval only, and retrieval + answer)"""
+    async def retrieve(query):
+        await rag.asearch_documents(query)
+
+    async def answer(query):
+        results = await rag.asearch_documents(query)
+        await rag.agenerate_answer_cached(query, results)
+
+    retrieval = summarize(*await run_concurrently(retrieve, queries, concurrency))
+    end_to_end = summarize(*await run_concurrently(answer, queries, concurrency))
+    return retrieval, end_to_end
+
+
+async def benchmark_api(rag, queries, concurrency):
+    """Query latency through the FastAPI app (in-process ASGI transport)"""
+    import httpx
+    import api
+
+    # Use the already ingested system instead of running the startup task
+    api.import_rag_components()
+    api.rag_system = rag
+    api.startup_state["status"] = "ready"
+    transport = httpx.ASGITransport(app=api.app)
+    auth = (os.environ["API_USERNAME"], os.environ["API_PASSWORD"])
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", auth=auth,
+                                 timeout=60) as client:
+        async def query(q):
+            response = await client.get("/query", params={"q": q})
+            response.raise_for_status()
+
+        return summarize(*await run_concurrently(query, queries, concurrency))
+
+
+def run_one(args):
+    """Benchmark one corpus size in this process (called in a subprocess)"""
+    from ingest import batched
+    from rag_system import SimpleRAGSystem
+
+    result = {"docs": args.run_one, "rss_start_mb": rss_mb()}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rag = SimpleRAGSystem(answer_cache_max_entries=1000 if args.answer_cache else 0)
+
+        # Streamed in batches, so peak RSS measures the index rather than the generated corpus
+        start = time.perf_counter()
+        failed = 0
+        embedded_tokens = 0.0
+        for documents in batched(generate_corpus(args.run_one, seed=args.seed), args.batch_size):
+            stats = rag.add_documents(documents, persist=False)
+            failed += stats["failed"]
+            embedded_tokens += stats["tokens_per_sec"] * stats["seconds"]
+        rag.persist()
+        ingest_seconds = time.perf_counter() - start
+
+        result["ingestion"] = {
+            "seconds": round(ingest_seconds, 3),
+            "docs_per_sec": round(args.run_one / ingest_seconds, 2) if ingest_seconds > 0 else 0.0,
+            "tokens_per_sec": round(embedded_tokens / ingest_seconds, 2) if ingest_seconds > 0 else 0.0,
+            "failed": failed,
+            "records": rag.store.count()
+        }
+        result["rss_after_ingestion_mb"] = rss_mb()
+
+        queries = generate_queries(args.queries, seed=args.seed + 1)
+        retrieval, end_to_end = asyncio.run(benchmark_queries(rag, queries, args.concurrency))
+        result["retrieval"] = retrieval
+        result["query"] = end_to_end
+        if args.api:
+            result["api_query"] = asyncio.run(benchmark_api(rag, queries, args.concurrency))
+
+    result["rss_end_mb"] = rss_mb()
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(RESULT_PREFIX + json.dumps(result))
+
+
+def free_port():
+    """Find a free local TCP port"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    """Wait until something listens on a local port"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Fake OpenAI server did not start on port {port}")
+
+
+def git_revision():
+    """Current git commit, if available"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RAG system against a fake OpenAI server")
+    parser.add_argument("--docs", default="1000,10000", help="Comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per corpus size")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent queries")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents generated and added per batch")
+    parser.add_argument("--backend", choices=["chroma", "numpy"], default="chroma", help="Vector store backend")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension of the fake server")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake API latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake API requests that fail")
+    parser.add_argument("--api", action="store_true", help="Also benchmark /query through the FastAPI app")
+    parser.add_argument("--answer-cache", action="store_true", help="Keep the semantic answer cache enabled")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic corpus and queries")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(args)
+        return
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    port = free_port()
+    server = subprocess.Popen([
+        sys.executable, os.path.join(here, "fake_openai.py"), "--port", str(port),
+        "--dim", str(args.dim), "--latency-ms", str(args.latency_ms), "--error-rate", str(args.error_rate)
+    ])
+    report = {
+        "version": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {
+            key: value for key, value in vars(args).items() if key not in ("run_one", "json")
+        },
+        "runs": []
+    }
+
+    try:
+        wait_for_port(port)
+        for n_docs in [int(size) for size in args.docs.split(",")]:
+            print(f"Benchmarking {n_docs} documents...")
+            workdir = tempfile.mkdtemp(prefix=f"rag-bench-{n_docs}-")
+            env = {
+                **os.environ,
+                "OPENAI_API_KEY": "sk-fake",
+                "OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1",
+                "API_USERNAME": "benchmark",
+                "API_PASSWORD": "benchmark",
+                "VECTOR_STORE": args.backend,
+                "PYTHONPATH": here + os.pathsep + os.environ.get("PYTHONPATH", "")
+            }
+            try:
+                # Each size runs in a fresh process and directory, so memory and state don't carry over
+                output = subprocess.run(
+                    [sys.executable, os.path.join(here, "benchmark.py"), "--run-one", str(n_docs),
+                     "--queries", str(args.queries), "--concurrency", str(args.concurrency),
+                     "--seed", str(args.seed), "--batch-size", str(args.batch_size)]
+                    + (["--api"] if args.api else []) + (["--answer-cache"] if args.answer_cache else []),
+                    cwd=workdir, env=env, capture_output=True, text=True, check=True
+                ).stdout
+            except subprocess.CalledProcessError as e:
+                print(f"❌ Run with {n_docs} documents failed:\n{e.stderr[-2000:]}")
+                continue
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+            result = json.loads(output.split(RESULT_PREFIX, 1)[1])
+            report["runs"].append(result)
+            print(f"  ingestion {result['ingestion']['docs_per_sec']} docs/s, "
+                  f"query p50 {result['query']['p50_ms']} ms / p99 {result['query']['p99_ms']} ms, "
+                  f"peak RSS {result['peak_rss_mb']} MB")
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark comparing vector store backends (ChromaDB vs the NumPy index)
+Reports recall@k against exact search, p50/p99 query latency and, for the
+NumPy index, the memory scanned per query (float32 matrix or quantized codes)
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from vector_store import ChromaVectorStore, NumpyVectorStore, normalize_rows
+
+
+def make_dataset(n_docs, n_queries, dim, seed=0):
+    """Generate clustered unit vectors, similar in shape to real embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n_docs // 100), dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), size=n_docs + n_queries)
+    vectors = centers[labels] + 0.5 * rng.normal(size=(n_docs + n_queries, dim)).astype(np.float32)
+    vectors = normalize_rows(vectors)
+    return vectors[:n_docs], vectors[n_docs:]
+
+
+def load_store(store, vectors, batch_size=5000):
+    """Load vectors into a store, returning the load time in seconds"""
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), batch_size):
+        batch = vectors[offset:offset + batch_size]
+        ids = [f"doc{offset + i}" for i in range(len(batch))]
+        store.upsert(
+            ids=ids,
+            embeddings=batch.tolist(),
+            documents=ids,
+            metadatas=[{"source": record_id} for record_id in ids]
+        )
+    store.persist()
+    return time.perf_counter() - start
+
+
+def run_queries(store, queries, k):
+    """Run queries one at a time, returning result ids and latencies in ms"""
+    result_ids, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results = store.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        result_ids.append(results["ids"][0])
+    return result_ids, latencies
+
+
+def recall_at_k(result_ids, exact_ids):
+    """Average fraction of the exact top-k found by a backend"""
+    return float(np.mean([
+        len(set(found) & set(exact)) / len(exact)
+        for found, exact in zip(result_ids, exact_ids)
+    ]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector store backends")
+    parser.add_argument("--docs", type=int, default=20000, help="Number of stored vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--dim", type=int, default=1536, help="Vector dimension")
+    parser.add_argument("-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--ivf-clusters", type=int, default=64, help="Clusters for the IVF mode (0 to skip)")
+    parser.add_argument("--nprobe", type=int, default=8, help="Clusters scanned per IVF query")
+    parser.add_argument("--quantization", default="int8,pq", help="Comma-separated quantizations to compare")
+    parser.add_argument("--pq-subspaces", default="16,48", help="Comma-separated PQ subspace counts")
+    parser.add_argument("--rescore-candidates", default="50", help="Comma-separated shortlist sizes")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    print(f"Generating {args.docs} vectors ({args.dim} dims) and {args.queries} queries...")
+    vectors, queries = make_dataset(args.docs, args.queries, args.dim)
+
+    # Exact top-k as ground truth
+    scores = queries @ vectors.T
+    exact_ids = [[f"doc{i}" for i in np.argsort(-row)[:args.k]] for row in scores]
+
+    backends = {
+        "chroma": lambda path: ChromaVectorStore(path=path, name="benchmark"),
+        "numpy": lambda path: NumpyVectorStore(path=path)
+    }
+    if args.ivf_clusters > 0:
+        backends["numpy-ivf"] = lambda path: NumpyVectorStore(
+            path=path, ivf_clusters=args.ivf_clusters, nprobe=args.nprobe
+        )
+    for quantization in [q for q in args.quantization.split(",") if q]:
+        subspace_options = [int(m) for m in args.pq_subspaces.split(",")] if quantization == "pq" else [0]
+        for subspaces in subspace_options:
+            for rescore in [int(r) for r in args.rescore_candidates.split(",")]:
+                name = f"numpy-{quantization}{subspaces or ''}-r{rescore}"
+                backends[name] = lambda path, quantization=quantization, subspaces=subspaces, rescore=rescore: (
+                    NumpyVectorStore(path=path, quantization=quantization, pq_subspaces=subspaces or 16,
+                                     rescore_candidates=rescore)
+                )
+
+    report = {"docs": args.docs, "queries": args.queries, "dim": args.dim, "k": args.k, "backends": {}}
+    for name, factory in backends.items():
+        path = tempfile.mkdtemp(prefix=f"bench-{name}-")
+        try:
+            print(f"\nBenchmarking {name}...")
+            store = factory(path)
+            load_seconds = load_store(store, vectors)
+            result_ids, latencies = run_queries(store, queries, args.k)
+            # Memory scanned per query: the quantized codes if there are any, else the matrix
+            scanned_mb = None
+            if isinstance(store, NumpyVectorStore):
+                memory = store.memory_stats()
+                scanned_mb = round((memory["code_bytes"] or memory["vector_bytes"]) / 2 ** 20, 2)
+            report["backends"][name] = {
+                "load_seconds": round(load_seconds, 3),
+                "recall_at_k": round(recall_at_k(result_ids, exact_ids), 4),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+                "scanned_mb": scanned_mb
+            }
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    print(f"\n{'backend':<20} {'load (s)':>10} {'recall@' + str(args.k):>10} {'p50 (ms)':>10} "
+          f"{'p99 (ms)':>10} {'memory (MB)':>12}")
+    for name, result in report["backends"].items():
+        memory = result["scanned_mb"] if result["scanned_mb"] is not None else "-"
+        print(f"{name:<20} {result['load_seconds']:>10} {result['recall_at_k']:>10} "
+              f"{result['p50_ms']:>10} {result['p99_ms']:>10} {memory:>12}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
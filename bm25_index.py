@@ -0,0 +1,172 @@
+"""
+In-memory BM25 inverted index with Polish-aware tokenization
+Used for hybrid (lexical + vector) retrieval and as a lexical-only fallback
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import threading
+
+# Frequent Polish words that carry no meaning for recipe search
+POLISH_STOPWORDS = {
+    "a", "aby", "albo", "ale", "bez", "by", "być", "co", "czy", "dla", "do", "i",
+    "ich", "jak", "jaki", "jaka", "jakie", "jakiego", "jest", "już", "lub", "ma",
+    "mi", "mnie", "na", "nad", "nie", "o", "od", "oraz", "po", "pod", "przez",
+    "przy", "się", "są", "ta", "te", "to", "tak", "w", "we", "z", "za", "ze",
+    "że", "który", "która", "które", "mój", "moja", "chcę", "potrzebuję", "proszę"
+}
+
+# Inflection endings removed by the light stemmer, longest first
+POLISH_SUFFIXES = sorted([
+    "owego", "owych", "owymi", "ach", "ami", "ego", "emu", "iej", "ich", "ymi",
+    "imi", "owy", "owa", "owe", "ową", "owi", "ów", "om", "em", "iem", "ej",
+    "ym", "im", "ek", "ka", "ki", "ku", "ce", "a", "e", "i", "o", "u", "y", "ą", "ę"
+], key=len, reverse=True)
+
+# Stems are cut to this many characters so that e.g. "koperek", "koperkiem"
+# and "koperkowy" all map to the same term
+STEM_LENGTH = 5
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def stem(word):
+    """Light Polish stemmer: strip one inflection ending and truncate"""
+    for suffix in POLISH_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return word[:STEM_LENGTH]
+
+
+def tokenize(text):
+    """Lowercase, drop stopwords and numbers, and stem"""
+    return [
+        stem(word) for word in WORD.findall(text.lower())
+        if word not in POLISH_STOPWORDS and not word.isdigit()
+    ]
+
+
+class BM25Index:
+    def __init__(self, path=None, k1=1.5, b=0.75):
+        """Create an index, loading it from path if it exists"""
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._doc_len = {}
+        self._doc_terms = {}
+        self._total_len = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        """Load postings and document lengths from disk"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self._postings = data["postings"]
+        self._doc_len = data["doc_len"]
+        self._total_len = sum(self._doc_len.values())
+        self._doc_terms = {doc_id: [] for doc_id in self._doc_len}
+        for term, postings in self._postings.items():
+            for doc_id in postings:
+                self._doc_terms[doc_id].append(term)
+
+    def save(self):
+        """Persist the index to disk"""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"postings": self._postings, "doc_len": self._doc_len}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def discard(self):
+        """Remove the saved index, e.g. when it no longer matches the documents"""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def count(self):
+        """Number of indexed documents"""
+        return len(self._doc_len)
+
+    def _remove(self, doc_id):
+        """Remove a document from the postings (lock must be held)"""
+        if doc_id not in self._doc_len:
+            return
+        self._total_len -= self._doc_len.pop(doc_id)
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def add_documents(self, ids, texts):
+        """Add or replace documents"""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                self._remove(doc_id)
+                terms = tokenize(text)
+                self._doc_len[doc_id] = len(terms)
+                self._doc_terms[doc_id] = list(set(terms))
+                self._total_len += len(terms)
+                for term in terms:
+                    postings = self._postings.setdefault(term, {})
+                    postings[doc_id] = postings.get(doc_id, 0) + 1
+
+    def remove_documents(self, ids):
+        """Remove documents by id"""
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def clear(self):
+        """Remove all documents"""
+        with self._lock:
+            self._postings = {}
+            self._doc_len = {}
+            self._doc_terms = {}
+            self._total_len = 0
+
+    def search(self, query, n_results=10, allowed_ids=None):
+        """Return [(doc_id, score)] of the best matching documents
+
+        With allowed_ids only those documents are scored.
+        """
+        terms = tokenize(query)
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not n_docs or not terms:
+                return []
+            avg_len = self._total_len / n_docs
+
+            scores = {}
+            for term in set(terms):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if allowed_ids is not None and doc_id not in allowed_ids:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked id lists: score(id) = sum of 1 / (k + rank)"""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True)]
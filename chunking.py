@@ -0,0 +1,189 @@
+"""
+Document chunking for the RAG system
+Splits long documents into token-bounded, overlapping chunks on Polish sentence
+boundaries and merges adjacent retrieved chunks back together
+"""
+
+import re
+
+from token_counter import count_tokens
+
+# Common Polish abbreviations that end with a period but do not end a sentence
+# (units such as "g" or "ml" are written without a period, so they are not listed)
+POLISH_ABBREVIATIONS = {
+    "np", "itp", "itd", "tj", "tzn", "tzw", "m.in", "ok", "ew", "szt", "łyż",
+    "łyżecz", "op", "opak", "ul", "wg", "zob", "por", "pkt", "nr", "ds", "prof",
+    "dr", "mgr", "inż", "św"
+}
+
+# Candidate sentence ends: terminal punctuation followed by whitespace, or a blank line
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\n\s*\n")
+
+
+def split_sentences(text):
+    """Split Polish text into sentences, keeping abbreviations and numbers intact"""
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        candidate = text[start:match.start()]
+        following = text[match.end():match.end() + 1]
+        last_word = candidate.rsplit(None, 1)[-1] if candidate.strip() else ""
+        stripped = last_word.rstrip(".").lower()
+
+        if match.group().count("\n") < 2:
+            # Not a sentence end after an abbreviation, an ordinal number ("1.")
+            # or when the next word starts with a lowercase letter
+            if last_word.endswith(".") and (stripped in POLISH_ABBREVIATIONS or stripped.isdigit()):
+                continue
+            if following and following.islower():
+                continue
+
+        if candidate.strip():
+            sentences.append(candidate.strip())
+        start = match.end()
+
+    if text[start:].strip():
+        sentences.append(text[start:].strip())
+    return sentences
+
+
+def _split_long_sentence(sentence, max_tokens):
+    """Split a sentence that alone exceeds max_tokens on word boundaries"""
+    pieces, current = [], []
+    for word in sentence.split():
+        if current and count_tokens(" ".join(current + [word])) > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_ids(parent_id, chunk_count):
+    """Record ids for the chunks of a document
+
+    A document that fits in a single chunk keeps its own id.
+    """
+    if chunk_count == 1:
+        return [parent_id]
+    return [f"{parent_id}#{index}" for index in range(chunk_count)]
+
+
+def chunk_text(text, max_tokens=400, overlap_tokens=50):
+    """Split text into chunks of at most max_tokens with sentence overlap"""
+    if count_tokens(text) <= max_tokens:
+        return [text]
+
+    sentences = []
+    for sentence in split_sentences(text):
+        if count_tokens(sentence) > max_tokens:
+            sentences.extend(_split_long_sentence(sentence, max_tokens))
+        else:
+            sentences.append(sentence)
+
+    chunks = []
+    current, current_tokens = [], 0
+    for sentence in sentences:
+        tokens = count_tokens(sentence)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+
+            # Carry the trailing sentences over as overlap
+            overlap, overlap_size = [], 0
+            for previous in reversed(current):
+                previous_tokens = count_tokens(previous)
+                if overlap_size + previous_tokens > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += previous_tokens
+            if overlap_size + tokens > max_tokens:
+                overlap, overlap_size = [], 0
+            current, current_tokens = overlap, overlap_size
+
+        current.append(sentence)
+        current_tokens += tokens
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def chunk_document(doc, max_tokens=400, overlap_tokens=50):
+    """Split a document into chunk documents with chunk-to-parent metadata"""
+    chunks = chunk_text(doc["content"], max_tokens, overlap_tokens)
+    return [
+        {
+            "id": chunk_id,
+            "content": content,
+            "metadata": {
+                "source": doc["id"],
+                "parent_id": doc["id"],
+                "chunk_index": index,
+                "chunk_count": len(chunks)
+            }
+        }
+        for index, (chunk_id, content) in enumerate(zip(chunk_ids(doc["id"], len(chunks)), chunks))
+    ]
+
+
+def _join_overlapping(first, second):
+    """Join two adjacent chunks, dropping the text they overlap on"""
+    for start in range(max(0, len(first) - len(second)), len(first)):
+        # Overlaps are whole sentences, so they start at a word boundary
+        if (start == 0 or first[start - 1] == " ") and second.startswith(first[start:]):
+            return first[:start] + second
+    return first + " " + second
+
+
+def merge_adjacent_chunks(results, n_results=None):
+    """Merge retrieved chunks of the same parent that are adjacent
+
+    Works on ChromaDB-style query results. A merged hit takes the rank and
+    distance of its best chunk. Results are trimmed to n_results hits.
+    """
+    merged = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+    for ids, documents, metadatas, distances in zip(
+        results["ids"], results["documents"], results["metadatas"], results["distances"]
+    ):
+        hits = []
+        by_parent = {}
+        for record_id, document, metadata, distance in zip(ids, documents, metadatas, distances):
+            metadata = metadata or {}
+            parent_id = metadata.get("parent_id", metadata.get("source", record_id))
+            hit = {
+                "id": record_id,
+                "document": document,
+                "metadata": dict(metadata),
+                "distance": distance,
+                "first": metadata.get("chunk_index", 0),
+                "last": metadata.get("chunk_index", 0)
+            }
+
+            # Attach to an already retrieved neighbouring chunk of the same parent
+            target = None
+            for existing in by_parent.get(parent_id, []):
+                if hit["first"] == existing["last"] + 1 or hit["last"] == existing["first"] - 1:
+                    target = existing
+                    break
+            if target is None:
+                hits.append(hit)
+                by_parent.setdefault(parent_id, []).append(hit)
+                continue
+
+            if hit["first"] > target["last"]:
+                target["document"] = _join_overlapping(target["document"], hit["document"])
+                target["last"] = hit["last"]
+            else:
+                target["document"] = _join_overlapping(hit["document"], target["document"])
+                target["first"] = hit["first"]
+            target["id"] = parent_id
+            target["metadata"]["chunk_index"] = target["first"]
+            target["metadata"]["merged_chunks"] = f"{target['first']}-{target['last']}"
+
+        hits = hits[:n_results] if n_results else hits
+        merged["ids"].append([hit["id"] for hit in hits])
+        merged["documents"].append([hit["document"] for hit in hits])
+        merged["metadatas"].append([hit["metadata"] for hit in hits])
+        merged["distances"].append([hit["distance"] for hit in hits])
+    return merged
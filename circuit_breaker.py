@@ -0,0 +1,117 @@
+"""
+Circuit breaker for upstream API calls
+Stops calling a failing service for a while once its recent error rate is
+too high, so requests fail fast instead of piling up
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker with closed, open and half-open states
+
+    Calls are recorded in a sliding time window. Once at least min_calls
+    were made and the failure rate reaches failure_rate, the circuit opens
+    and calls are rejected for open_seconds. After that a single probe call
+    is let through (half-open): success closes the circuit, failure opens
+    it again.
+    """
+
+    def __init__(self, name, failure_rate=0.5, min_calls=10, window_seconds=60, open_seconds=30):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.rejected = 0
+        self.trips = 0
+        self._calls = deque()
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        """Drop calls older than the window"""
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now):
+        """Start rejecting calls"""
+        self.state = "open"
+        self._opened_at = now
+        self._probing = False
+        self.trips += 1
+        print(f"⚠️ Circuit '{self.name}' opened, failing fast for {self.open_seconds}s")
+
+    @property
+    def is_open(self):
+        """Whether calls are currently being rejected"""
+        with self._lock:
+            if self.state == "open":
+                return time.monotonic() - self._opened_at < self.open_seconds
+            return self.state == "half_open" and self._probing
+
+    def check(self):
+        """Raise CircuitOpenError if a call is not allowed right now"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open" and now - self._opened_at >= self.open_seconds:
+                self.state = "half_open"
+            if self.state == "half_open":
+                # A probe that never reported back (e.g. a cancelled request)
+                # is replaced after open_seconds
+                if not self._probing or now - self._opened_at >= 2 * self.open_seconds:
+                    self._probing = True
+                    self._opened_at = now - self.open_seconds
+                    return
+            elif self.state == "closed":
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"Circuit '{self.name}' is open, upstream calls are paused")
+
+    def record_success(self):
+        """Record a successful call"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "half_open":
+                self.state = "closed"
+                self._probing = False
+                self._calls.clear()
+            self._calls.append((now, True))
+            self._trim(now)
+
+    def record_failure(self):
+        """Record a failed call, opening the circuit if the error rate is too high"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "half_open":
+                self._open(now)
+                return
+            if self.state == "open":
+                return
+            self._calls.append((now, False))
+            self._trim(now)
+            failures = sum(1 for _, ok in self._calls if not ok)
+            if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.failure_rate:
+                self._open(now)
+
+    def stats(self):
+        """Current state and counters"""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            failures = sum(1 for _, ok in self._calls if not ok)
+            return {
+                "state": self.state,
+                "recent_calls": len(self._calls),
+                "recent_failure_rate": round(failures / len(self._calls), 4) if self._calls else 0.0,
+                "trips": self.trips,
+                "rejected": self.rejected
+            }
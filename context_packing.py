@@ -0,0 +1,94 @@
+"""
+Context packing for answer generation
+Fits retrieved passages into a token budget in relevance order
+"""
+
+from chunking import split_sentences
+from token_counter import count_tokens
+
+# Tokens used by the blank line between two passages in the prompt
+SEPARATOR_TOKENS = 1
+
+# Don't bother including a truncated passage shorter than this
+MIN_TRUNCATED_TOKENS = 20
+
+
+def _normalize_sentence(sentence):
+    """Normalize a sentence for duplicate detection"""
+    return " ".join(sentence.lower().split())
+
+
+def _truncate(sentences, max_tokens, model):
+    """Keep leading sentences (and words of the last one) within max_tokens"""
+    kept, used = [], 0
+    for sentence in sentences:
+        tokens = count_tokens(sentence, model) + (1 if kept else 0)
+        if used + tokens <= max_tokens:
+            kept.append(sentence)
+            used += tokens
+            continue
+
+        words = []
+        for word in sentence.split():
+            candidate = " ".join(kept + [" ".join(words + [word])])
+            if count_tokens(candidate, model) > max_tokens:
+                break
+            words.append(word)
+        if words:
+            kept.append(" ".join(words) + "…")
+        break
+    return " ".join(kept)
+
+
+def pack_context(documents, max_tokens=1500, model="gpt-3.5-turbo"):
+    """Pack documents (most relevant first) into a token budget
+
+    Sentences already included from a more relevant passage are dropped, so
+    overlapping chunks are not repeated in the prompt. The passage that does
+    not fit is truncated and the rest are left out. Returns a dict with the
+    packed documents, the tokens used, whether the tail passage was
+    truncated and how many passages were dropped.
+    """
+    seen = set()
+    packed = []
+    used = 0
+    truncated = False
+    dropped = 0
+
+    for index, document in enumerate(documents):
+        sentences = []
+        for sentence in split_sentences(document):
+            key = _normalize_sentence(sentence)
+            if key not in seen:
+                seen.add(key)
+                sentences.append(sentence)
+        if not sentences:
+            dropped += 1
+            continue
+
+        text = " ".join(sentences)
+        separator = SEPARATOR_TOKENS if packed else 0
+        tokens = count_tokens(text, model)
+        if used + separator + tokens <= max_tokens:
+            packed.append(text)
+            used += separator + tokens
+            continue
+
+        # Truncate the tail passage to the remaining budget and stop
+        remaining = max_tokens - used - separator
+        text = _truncate(sentences, remaining, model) if remaining >= MIN_TRUNCATED_TOKENS else ""
+        if text:
+            packed.append(text)
+            used += separator + count_tokens(text, model)
+            truncated = True
+            dropped += len(documents) - index - 1
+        else:
+            dropped += len(documents) - index
+        break
+
+    return {
+        "documents": packed,
+        "tokens": used,
+        "truncated": truncated,
+        "dropped": dropped
+    }
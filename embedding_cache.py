@@ -0,0 +1,140 @@
+"""
+Persistent content-addressed embedding cache
+Stores float32 embedding vectors in a SQLite blob store keyed by
+(model name, hash of normalized text) with LRU eviction
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+
+def normalize_text(text):
+    """Normalize text so trivially different inputs share a cache entry"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_key(model, text):
+    """Build the cache key for a model and text"""
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class EmbeddingCache:
+    def __init__(self, path="./cache/embeddings.sqlite3", max_entries=100000):
+        """Open (or create) the cache database"""
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get(self, model, text):
+        """Get a cached embedding or None"""
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model, texts):
+        """Get cached embeddings for a list of texts (None for misses)"""
+        keys = [make_key(model, text) for text in texts]
+        with self._lock:
+            found = {}
+            unique_keys = list(set(keys))
+            # Stay below SQLite's host parameter limit
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            results = []
+            for key in keys:
+                if key in found:
+                    self.hits += 1
+                    results.append(np.frombuffer(found[key], dtype=np.float32).tolist())
+                else:
+                    self.misses += 1
+                    results.append(None)
+            return results
+
+    def set(self, model, text, embedding):
+        """Store an embedding"""
+        self.set_many(model, [text], [embedding])
+
+    def set_many(self, model, texts, embeddings):
+        """Store embeddings for a list of texts"""
+        if self.max_entries <= 0:
+            return
+        now = time.time()
+        rows = [
+            (make_key(model, text), np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows
+            )
+            self._entries += self._conn.total_changes - before
+            if self._entries > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Evict least recently used entries down to 90% of the size cap"""
+        target = int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+            (self._entries - target,)
+        )
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def clear(self):
+        """Remove all cached embeddings"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._entries = 0
+
+    def stats(self):
+        """Return hit/miss counters and cache size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": self._entries,
+            "max_entries": self.max_entries
+        }
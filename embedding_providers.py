@@ -0,0 +1,157 @@
+"""
+Embedding providers for the RAG system
+OpenAI embeddings over the network, or a local CPU model (sentence-transformers,
+optionally with the ONNX runtime) loaded once per process
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import record_usage
+from openai_transport import acall_with_retries, call_with_retries
+from token_counter import count_tokens
+
+OPENAI_EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# Multilingual (Polish included), 384 dimensions, fast on CPU
+DEFAULT_LOCAL_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+class OpenAIEmbeddingProvider:
+    """Embeddings from the OpenAI API, with retries, rate limiting and a circuit breaker
+
+    Async calls are made while a user waits, so they use
+    request_retry_settings (acall_with_retries arguments, e.g. a deadline)
+    when given; sync calls, used by ingestion, use the retry settings.
+    """
+
+    def __init__(self, client, async_client, limiter=None, breaker=None, max_retries=3,
+                 backoff_base=0.5, backoff_max=20, model=OPENAI_EMBEDDING_MODEL, request_retry_settings=None):
+        self.model = model
+        self.client = client
+        self.async_client = async_client
+        self.limiter = limiter
+        self.breaker = breaker
+        self.retry_settings = {
+            "max_retries": max_retries, "backoff_base": backoff_base, "backoff_max": backoff_max
+        }
+        self.request_retry_settings = request_retry_settings or self.retry_settings
+
+    def _embeddings(self, response):
+        """Embeddings of a response in input order, counting its token usage"""
+        record_usage(self.model, getattr(response, "usage", None))
+        # The API may return items out of order, so sort by input index
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def embed(self, texts):
+        """Embed a list of texts in one request"""
+        response = call_with_retries(
+            self.client.embeddings.create,
+            limiter=self.limiter,
+            breaker=self.breaker,
+            tokens=sum(count_tokens(text, self.model) for text in texts),
+            model=self.model,
+            input=texts,
+            **self.retry_settings
+        )
+        return self._embeddings(response)
+
+    async def aembed(self, texts):
+        """Async version of embed"""
+        response = await acall_with_retries(
+            self.async_client.embeddings.create,
+            limiter=self.limiter,
+            breaker=self.breaker,
+            tokens=sum(count_tokens(text, self.model) for text in texts),
+            model=self.model,
+            input=texts,
+            **self.request_retry_settings
+        )
+        return self._embeddings(response)
+
+
+class LocalEmbeddingProvider:
+    """Embeddings from a sentence-transformers model on the CPU
+
+    The model is loaded once and runs on a single thread of its own, using
+    `threads` intra-op threads. Concurrent async requests are batched:
+    texts that arrive while a batch is running are embedded together in
+    the next one.
+    """
+
+    def __init__(self, model=DEFAULT_LOCAL_MODEL, backend="torch", threads=None, batch_size=64):
+        self.model = model
+        self.batch_size = batch_size
+        self._encoder = self._load(model, backend, threads)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-embeddings")
+        self._pending = []
+        # asyncio only keeps weak references to tasks, so the running drain is held here
+        self._drain_task = None
+
+    @staticmethod
+    def _load(model, backend, threads):
+        """Load the sentence-transformers model"""
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The local embedding provider requires sentence-transformers "
+                "(pip install sentence-transformers, or sentence-transformers[onnx] for the ONNX backend)"
+            ) from e
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        kwargs = {"backend": backend} if backend != "torch" else {}
+        return SentenceTransformer(model, device="cpu", **kwargs)
+
+    def embed(self, texts):
+        """Embed a list of texts (normalized vectors)"""
+        vectors = self._encoder.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        )
+        return vectors.tolist()
+
+    async def aembed(self, texts):
+        """Embed texts on the model thread, batched with other pending requests"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((texts, future))
+        if self._drain_task is None:
+            self._drain_task = loop.create_task(self._drain())
+        return await future
+
+    async def _drain(self):
+        """Embed pending requests, all that are waiting at a time"""
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                batch, self._pending = self._pending, []
+                texts = [text for request_texts, _ in batch for text in request_texts]
+                try:
+                    context = contextvars.copy_context()
+                    vectors = await loop.run_in_executor(
+                        self._executor, functools.partial(context.run, self.embed, texts)
+                    )
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                offset = 0
+                for request_texts, future in batch:
+                    if not future.done():
+                        future.set_result(vectors[offset:offset + len(request_texts)])
+                    offset += len(request_texts)
+        finally:
+            self._drain_task = None
+
+
+def create_embedding_provider(name="openai", **kwargs):
+    """Create an embedding provider by name ("openai" or "local")"""
+    if name == "openai":
+        return OpenAIEmbeddingProvider(**kwargs)
+    if name == "local":
+        return LocalEmbeddingProvider(**kwargs)
+    raise ValueError(f"Unknown embedding provider: {name}")
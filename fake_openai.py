@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Deterministic local stand-in for the OpenAI embeddings and chat endpoints
+Used by benchmark.py to measure the service without a live API key;
+supports injected latency and errors
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+from functools import lru_cache
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+@lru_cache(maxsize=100000)
+def _word_vector(word, dim):
+    """Fixed random unit vector for a word"""
+    seed = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def fake_embedding(text, dim=1536):
+    """Deterministic embedding: normalized sum of word vectors
+
+    Texts that share words get similar vectors, so retrieval over a fake
+    corpus behaves roughly like it does with real embeddings.
+    """
+    words = WORD.findall(text.lower())
+    if not words:
+        return np.zeros(dim, dtype=np.float32)
+    vector = np.sum([_word_vector(word, dim) for word in words], axis=0)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _count_tokens(text):
+    """Rough token count (the fake server does not need to be exact)"""
+    return max(1, len(text) // 3)
+
+
+def create_app(dim=1536, latency_ms=50.0, jitter_ms=10.0, error_rate=0.0, token_latency_ms=5.0,
+               retry_after=0.1, seed=0):
+    """Create the fake OpenAI app
+
+    Each request waits latency_ms (plus up to jitter_ms) and fails with a
+    429 (with Retry-After) or a 500 with probability error_rate.
+    """
+    app = FastAPI(title="Fake OpenAI API")
+    rng = random.Random(seed)
+    app.state.requests = 0
+    app.state.errors = 0
+
+    async def delay_or_fail():
+        """Simulate upstream latency and errors, returning an error response or None"""
+        app.state.requests += 1
+        await asyncio.sleep((latency_ms + rng.uniform(0, jitter_ms)) / 1000)
+        if error_rate and rng.random() < error_rate:
+            app.state.errors += 1
+            if rng.random() < 0.5:
+                return JSONResponse(
+                    status_code=429,
+                    headers={"retry-after": str(retry_after)},
+                    content={"error": {"message": "Rate limit reached (injected)", "type": "requests",
+                                       "code": "rate_limit_exceeded"}}
+                )
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "Internal server error (injected)", "type": "server_error"}}
+            )
+        return None
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        error = await delay_or_fail()
+        if error:
+            return error
+
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        data = []
+        for index, text in enumerate(inputs):
+            vector = fake_embedding(text, dim)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+
+        tokens = sum(_count_tokens(text) for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        error = await delay_or_fail()
+        if error:
+            return error
+
+        prompt = "\n".join(message["content"] for message in body["messages"])
+        question = prompt.rsplit("Question:", 1)[-1].split("Answer:", 1)[0].strip()
+        answer = f"To jest przykładowa odpowiedź na pytanie: {question}"
+        prompt_tokens = _count_tokens(prompt)
+        completion_tokens = _count_tokens(answer)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        completion_id = f"chatcmpl-fake-{app.state.requests}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def stream():
+            def chunk(delta, finish_reason=None, chunk_usage=None):
+                return "data: " + json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                    if chunk_usage is None else [],
+                    "usage": chunk_usage
+                }, ensure_ascii=False) + "\n\n"
+
+            yield chunk({"role": "assistant", "content": ""})
+            for word in answer.split(" "):
+                await asyncio.sleep(token_latency_ms / 1000)
+                yield chunk({"content": word + " "})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk({}, chunk_usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests, "errors": app.state.errors}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Base latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Random extra latency per request")
+    parser.add_argument("--token-latency-ms", type=float, default=5.0, help="Delay between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 429/500")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency and error injection")
+    args = parser.parse_args()
+
+    app = create_app(
+        dim=args.dim, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        token_latency_ms=args.token_latency_ms, retry_after=args.retry_after, seed=args.seed
+    )
+    print(f"Fake OpenAI API on http://{args.host}:{args.port}/v1 "
+          f"(set OPENAI_BASE_URL to use it)")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
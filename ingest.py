@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Ingestion step for the Sauce Recipe RAG System
+Syncs the recipes into the index once, so that server workers can open it
+read-only (INGEST_ON_STARTUP=false). Large corpora (JSONL files or directories
+of text files) are streamed in batches with a checkpoint, so an interrupted
+load resumes where it stopped.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from file_lock import FileLock
+
+# Held while ingesting, so only one process (this script or a server worker)
+# writes to the index at a time
+INGEST_LOCK_PATH = os.getenv("INGEST_LOCK_PATH", "./cache/ingest.lock")
+
+INGEST_CHECKPOINT_PATH = os.getenv("INGEST_CHECKPOINT_PATH", "./cache/ingest_checkpoint.json")
+
+# Corpus tag of bulk-loaded records, which the startup sync never deletes
+BULK_CORPUS = "bulk"
+
+TEXT_EXTENSIONS = (".txt", ".md")
+
+
+def run_ingestion(documents, progress=None, lock_path=INGEST_LOCK_PATH):
+    """Sync documents into the index under the ingestion lock
+
+    Returns the RAG system (opened for writing) and the ingestion stats.
+    """
+    from rag_system import SimpleRAGSystem
+
+    with FileLock(lock_path):
+        rag = SimpleRAGSystem()
+        stats = rag.sync_documents(documents, progress=progress)
+    return rag, stats
+
+
+def expand_sources(paths):
+    """Input files in a stable order, as (path, root) pairs
+
+    Directories are walked for .jsonl and text files; root is the directory
+    given on the command line, used to build text document ids.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path, os.path.dirname(path)
+            continue
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories.sort()
+            for name in sorted(files):
+                if name.endswith((".jsonl",) + TEXT_EXTENSIONS):
+                    yield os.path.join(directory, name), path
+
+
+def iter_documents(paths, skip=0):
+    """Read documents from JSONL files and text files, one at a time
+
+    Every JSONL line and every text file is one input record, so the first
+    `skip` records can be passed over without parsing them. JSONL records
+    have an "id" and a "content" (or "text") field. Records that cannot be
+    read are yielded with empty content and dropped by normalize_document.
+    """
+    for path, root in expand_sources(paths):
+        if path.endswith(".jsonl"):
+            name = os.path.splitext(os.path.basename(path))[0]
+            with open(path, encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    if skip:
+                        skip -= 1
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        record = {}
+                    if not isinstance(record, dict):
+                        record = {}
+                    yield {
+                        "id": str(record.get("id") or f"{name}:{line_number}"),
+                        "content": record.get("content") or record.get("text") or ""
+                    }
+        else:
+            if skip:
+                skip -= 1
+                continue
+            with open(path, encoding="utf-8", errors="replace") as f:
+                content = f.read()
+            yield {"id": os.path.splitext(os.path.relpath(path, root))[0], "content": content}
+
+
+def normalize_document(doc):
+    """Normalize the text of a document, or None if there is nothing to index
+
+    Unicode is NFC-normalized and runs of spaces collapsed; paragraph breaks
+    are kept, since chunking splits on them.
+    """
+    if not isinstance(doc["content"], str):
+        return None
+    content = unicodedata.normalize("NFC", doc["content"]).replace("\r\n", "\n")
+    content = re.sub(r"[ \t\f\v]+", " ", content)
+    content = re.sub(r" ?\n[ \n]*\n ?", "\n\n", content).strip()
+    if not content:
+        return None
+    return {"id": doc["id"], "content": content}
+
+
+def batched(iterable, size):
+    """Split an iterable into lists of at most `size` items"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def load_checkpoint(path, sources):
+    """Checkpoint of an unfinished earlier load of the same sources, or None"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get("sources") != sources:
+        print(f"Checkpoint {path} is for other sources, starting over", file=sys.stderr)
+        return None
+    if checkpoint.get("complete"):
+        # A finished load is run again from the start; unchanged records are skipped
+        return None
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    """Write the checkpoint atomically"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_bulk_ingestion(paths, batch_size=1000, workers=4, checkpoint_path=INGEST_CHECKPOINT_PATH,
+                       checkpoint_every=10000, restart=False, lock_path=INGEST_LOCK_PATH, show_progress=True,
+                       corpus=BULK_CORPUS):
+    """Stream documents from files into the index, resuming from a checkpoint
+
+    Documents are read, normalized and added in batches of `batch_size`, with
+    up to `workers` batches embedding at a time; at most twice that many are
+    held in memory. Every `checkpoint_every` records the new records are
+    journaled (see SimpleRAGSystem.checkpoint) and the number of records done
+    is checkpointed; the index is written in full and the checkpoint marked
+    complete at the end. Records are tagged with `corpus`, so the
+    sync of the sample recipes leaves them be. Unlike run_ingestion,
+    documents missing from the input are not deleted.
+    Returns the stats of the load.
+    """
+    from rag_system import SimpleRAGSystem
+
+    sources = [os.path.abspath(path) for path in paths]
+    checkpoint = None if restart else load_checkpoint(checkpoint_path, sources)
+    if checkpoint is None:
+        checkpoint = {
+            "sources": sources, "records_done": 0, "added": 0, "updated": 0, "skipped": 0,
+            "invalid": 0, "failed": 0, "failed_ids": [], "seconds": 0.0, "complete": False
+        }
+    elif show_progress:
+        print(f"Resuming after {checkpoint['records_done']:,} records", file=sys.stderr)
+
+    start_time = time.perf_counter()
+    resumed_at = checkpoint["records_done"]
+    resumed_seconds = checkpoint["seconds"]
+    last_checkpoint = resumed_at
+
+    def report():
+        done = checkpoint["records_done"] - resumed_at
+        elapsed = time.perf_counter() - start_time
+        rate = done / elapsed if elapsed > 0 else 0.0
+        print(f"\r{checkpoint['records_done']:,} records, {checkpoint['added']:,} added, "
+              f"{checkpoint['updated']:,} updated, {checkpoint['skipped']:,} unchanged, "
+              f"{checkpoint['failed']:,} failed, {rate:,.0f} records/s",
+              end="", file=sys.stderr, flush=True)
+
+    def finish(future, record_count, invalid_count):
+        stats = future.result()
+        checkpoint["records_done"] += record_count
+        checkpoint["invalid"] += invalid_count
+        for key in ("added", "updated", "skipped", "failed"):
+            checkpoint[key] += stats[key]
+        checkpoint["failed_ids"].extend(stats["failed_ids"])
+
+    def save(rag, complete=False):
+        if complete:
+            rag.persist()
+        else:
+            rag.checkpoint()
+        checkpoint["complete"] = complete
+        checkpoint["seconds"] = round(resumed_seconds + time.perf_counter() - start_time, 3)
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    records = batched(iter_documents(paths, skip=resumed_at), batch_size)
+    with FileLock(lock_path), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rag = SimpleRAGSystem()
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as executor:
+            for batch in records:
+                documents = [doc for doc in map(normalize_document, batch) if doc]
+                future = executor.submit(rag.add_documents, documents, persist=False, corpus=corpus)
+                in_flight.append((future, len(batch), len(batch) - len(documents)))
+                # Batches complete in order, so records_done is always a finished prefix
+                while len(in_flight) >= workers * 2:
+                    finish(*in_flight.popleft())
+                    if show_progress:
+                        report()
+                if checkpoint["records_done"] - last_checkpoint >= checkpoint_every:
+                    save(rag)
+                    last_checkpoint = checkpoint["records_done"]
+            while in_flight:
+                finish(*in_flight.popleft())
+                if show_progress:
+                    report()
+        save(rag, complete=True)
+
+    if show_progress:
+        print(file=sys.stderr)
+    elapsed = time.perf_counter() - start_time
+    loaded = checkpoint["records_done"] - resumed_at
+    return {
+        "records": checkpoint["records_done"],
+        "added": checkpoint["added"],
+        "updated": checkpoint["updated"],
+        "skipped": checkpoint["skipped"],
+        "invalid": checkpoint["invalid"],
+        "failed": checkpoint["failed"],
+        "failed_ids": checkpoint["failed_ids"],
+        "seconds": round(elapsed, 3),
+        "total_seconds": checkpoint["seconds"],
+        "records_per_sec": round(loaded / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the sauce recipes into the index")
+    parser.add_argument("sources", nargs="*",
+                        help="JSONL files or directories of text files to load (default: the sample recipes)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents read and added per batch")
+    parser.add_argument("--workers", type=int, default=4, help="Batches embedded in parallel")
+    parser.add_argument("--checkpoint", default=INGEST_CHECKPOINT_PATH, help="Checkpoint file for resuming")
+    parser.add_argument("--checkpoint-every", type=int, default=10000, help="Records between checkpoints")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    parser.add_argument("--lock-path", default=INGEST_LOCK_PATH, help="Ingestion lock file")
+    parser.add_argument("--corpus", default=BULK_CORPUS, help="Corpus tag of the loaded records")
+    parser.add_argument("--json", action="store_true", help="Print the ingestion stats as JSON")
+    args = parser.parse_args()
+
+    if args.sources:
+        stats = run_bulk_ingestion(
+            args.sources, batch_size=args.batch_size, workers=args.workers, checkpoint_path=args.checkpoint,
+            checkpoint_every=args.checkpoint_every, restart=args.restart, lock_path=args.lock_path,
+            show_progress=not args.json, corpus=args.corpus
+        )
+        if args.json:
+            print(json.dumps(stats, indent=2))
+        else:
+            print(f"Loaded {stats['records']} records: added {stats['added']}, updated {stats['updated']}, "
+                  f"skipped {stats['skipped']}, invalid {stats['invalid']}, failed {stats['failed']} "
+                  f"in {stats['seconds']}s ({stats['records_per_sec']} records/sec)")
+        return
+
+    from sample_documents import SAMPLE_DOCUMENTS
+
+    _, stats = run_ingestion(SAMPLE_DOCUMENTS, lock_path=args.lock_path)
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        print(f"Added {stats['added']}, updated {stats['updated']}, deleted {stats['deleted']}, "
+              f"skipped {stats['skipped']}, failed {stats['failed']} in {stats['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Lightweight metrics for the RAG system
+Counters, gauges and histograms rendered in the Prometheus text format (optionally
+added up across server worker processes), and timing spans that also collect
+per-request stage timings
+"""
+
+import atexit
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from cache hits to slow completions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labelnames, values, extra=None):
+    """Format a label set as {a="x",b="y"}"""
+    pairs = list(zip(labelnames, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = [
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    ]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    """Format a sample value"""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """Add amount to the counter for a label set"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        """Copy of the values by label set"""
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def combine(value, other):
+        """Value of two processes together"""
+        return value + other
+
+    def render(self, values=None):
+        """Lines in the Prometheus text format (of the given values, or this process's)"""
+        values = self.snapshot() if values is None else values
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down, with labels"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        """Set the gauge for a label set"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Histogram with cumulative buckets, a sum and a count per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Record a value for a label set"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def snapshot(self):
+        """Copy of the (bucket counts, sum) by label set"""
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+    @staticmethod
+    def combine(value, other):
+        """Value of two processes together"""
+        return [a + b for a, b in zip(value[0], other[0])], value[1] + other[1]
+
+    def render(self, values=None):
+        """Lines in the Prometheus text format (of the given values, or this process's)"""
+        values = self.snapshot() if values is None else values
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _process_alive(pid):
+    """Whether a process with this pid is running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    """Collection of metrics rendered together
+
+    With share(directory) every process periodically writes its values to
+    a file in the directory, and render() adds up the values of all
+    processes, so each server worker reports the totals of the whole
+    server. Counters and histograms of exited processes are kept (totals
+    never go down); gauges only count running processes.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self.directory = None
+
+    def register(self, metric):
+        """Add a metric and return it"""
+        self._metrics.append(metric)
+        return metric
+
+    def _snapshot(self):
+        return {
+            metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+            for metric in self._metrics
+        }
+
+    def flush(self):
+        """Write this process's values to the shared directory"""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def share(self, directory, interval=5.0):
+        """Aggregate metrics across processes through a shared directory
+
+        Values are written every `interval` seconds and at exit, so the
+        totals of other processes lag by up to that long.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+        def flush_periodically():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        threading.Thread(target=flush_periodically, name="metrics-flush", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _other_processes(self):
+        """(pid, values by metric name) of the other processes in the shared directory"""
+        for name in os.listdir(self.directory):
+            pid, extension = os.path.splitext(name)
+            if extension != ".json" or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    yield int(pid), json.load(f)
+            except (OSError, ValueError):
+                continue
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        values = {metric.name: metric.snapshot() for metric in self._metrics}
+        if self.directory:
+            for pid, snapshot in self._other_processes():
+                alive = _process_alive(pid)
+                for metric in self._metrics:
+                    if metric.kind == "gauge" and not alive:
+                        continue
+                    own = values[metric.name]
+                    for key, value in snapshot.get(metric.name, []):
+                        key = tuple(key)
+                        own[key] = metric.combine(own[key], value) if key in own else value
+
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(values[metric.name]))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each stage of answering a query",
+    ["stage"]
+))
+OPENAI_TOKENS = REGISTRY.register(Counter(
+    "rag_openai_tokens_total",
+    "Tokens reported by OpenAI API responses",
+    ["model", "type"]
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "rag_http_request_duration_seconds",
+    "HTTP request latency until the response starts",
+    ["method", "path", "status"]
+))
+ADMISSION_IN_FLIGHT = REGISTRY.register(Gauge(
+    "rag_admission_in_flight",
+    "Queries admitted and being answered"
+))
+ADMISSION_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "rag_admission_queue_depth",
+    "Queries waiting for admission"
+))
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    "rag_admission_rejected_total",
+    "Queries rejected by admission control",
+    ["reason"]
+))
+ADMISSION_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "rag_admission_wait_seconds",
+    "Time admitted queries waited in the queue"
+))
+
+# Stage timings of the current request (None outside of a timed request)
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request_timings():
+    """Start collecting stage timings for the current request, returning the dict"""
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+@contextmanager
+def span(stage):
+    """Time a block as a stage: exported to the histogram and the request timings"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[f"{stage}_ms"] = round(timings.get(f"{stage}_ms", 0.0) + elapsed * 1000, 2)
+
+
+def record_usage(model, usage):
+    """Count the tokens of an OpenAI response's usage object"""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    if prompt_tokens:
+        OPENAI_TOKENS.inc(prompt_tokens, model=model, type="prompt")
+    if completion_tokens:
+        OPENAI_TOKENS.inc(completion_tokens, model=model, type="completion")
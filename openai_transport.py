@@ -0,0 +1,236 @@
+"""
+Transport layer for the OpenAI clients
+Pooled keep-alive HTTP clients, retries with jittered exponential backoff
+that honor Retry-After, an overall deadline for calls a user is waiting on,
+and a client-side request/token rate limiter
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+import openai
+
+# Errors worth retrying as-is; anything else is treated as a bad input
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call with retries runs past its overall deadline"""
+
+
+def create_http_clients(timeout=30.0, connect_timeout=5.0, max_connections=32,
+                        max_keepalive_connections=16, keepalive_expiry=60.0):
+    """Create the shared sync and async HTTP clients for the OpenAI clients
+
+    Connections are kept alive between calls, so requests after the first
+    skip the TCP and TLS handshakes.
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry
+    )
+    timeouts = httpx.Timeout(timeout, connect=connect_timeout)
+    return (
+        httpx.Client(limits=limits, timeout=timeouts),
+        httpx.AsyncClient(limits=limits, timeout=timeouts)
+    )
+
+
+def is_retryable(error):
+    """Whether an OpenAI error is transient
+
+    A 429 caused by an exhausted quota will not go away by waiting, so it is
+    not retried.
+    """
+    if not isinstance(error, RETRYABLE_ERRORS):
+        return False
+    return getattr(error, "code", None) != "insufficient_quota"
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait, or None"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        # Retry-After may also be an HTTP date, fall back to backoff
+        return None
+    return None
+
+
+def backoff_delay(attempt, error=None, base=0.5, max_delay=20.0):
+    """Delay before retry number attempt (0-based)
+
+    Uses the server's Retry-After when given, otherwise exponential backoff
+    with full jitter so that clients hit by the same 429 don't retry in
+    lockstep.
+    """
+    delay = retry_after(error) if error is not None else None
+    if delay is not None:
+        return min(delay, max_delay)
+    return random.uniform(0, min(max_delay, base * 2 ** attempt))
+
+
+class RateLimiter:
+    """Token bucket limiter for requests and tokens per minute
+
+    Each call reserves its request and tokens up front; if a bucket runs
+    short the caller waits until it has refilled. A limit of 0 disables that
+    bucket. Shared by threads and the event loop. The limits are account
+    quotas: with `shares` processes using the same account (e.g. server
+    workers), each limiter gets an equal share of them.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, shares=1):
+        self.shares = max(1, shares)
+        self.requests_per_minute = requests_per_minute / self.shares
+        self.tokens_per_minute = tokens_per_minute / self.shares
+        self.waits = 0
+        self.waited_seconds = 0.0
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        """Take a request and tokens from the buckets, returning the wait in seconds"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+
+            wait = 0.0
+            if self.requests_per_minute:
+                rate = self.requests_per_minute / 60
+                self._requests = min(self.requests_per_minute, self._requests + elapsed * rate) - 1
+                if self._requests < 0:
+                    wait = max(wait, -self._requests / rate)
+            if self.tokens_per_minute:
+                rate = self.tokens_per_minute / 60
+                # A single call larger than the quota can only wait for a full bucket
+                tokens = min(tokens, self.tokens_per_minute)
+                self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * rate) - tokens
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / rate)
+
+            if wait:
+                self.waits += 1
+                self.waited_seconds += wait
+            return wait
+
+    def acquire(self, tokens=0):
+        """Wait (blocking) until a request with this many tokens is allowed"""
+        wait = self._reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens=0):
+        """Wait (async) until a request with this many tokens is allowed"""
+        wait = self._reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def stats(self):
+        """Limits and how often callers had to wait"""
+        return {
+            "requests_per_minute": round(self.requests_per_minute, 2),
+            "tokens_per_minute": round(self.tokens_per_minute, 2),
+            "shares": self.shares,
+            "waits": self.waits,
+            "waited_seconds": round(self.waited_seconds, 3)
+        }
+
+
+def call_with_retries(create, limiter=None, breaker=None, tokens=0, max_retries=3, backoff_base=0.5,
+                      backoff_max=20.0, **kwargs):
+    """Call an OpenAI client method, retrying transient errors
+
+    With a circuit breaker, every attempt is recorded and CircuitOpenError
+    is raised without calling the API while the circuit is open.
+    """
+    for attempt in range(max_retries + 1):
+        if breaker:
+            breaker.check()
+        if limiter:
+            limiter.acquire(tokens)
+        try:
+            response = create(**kwargs)
+        except Exception as e:
+            if breaker:
+                # Only upstream trouble counts, a rejected input means the service is up
+                if isinstance(e, RETRYABLE_ERRORS):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, e, backoff_base, backoff_max)
+            print(f"OpenAI request failed ({e.__class__.__name__}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+        else:
+            if breaker:
+                breaker.record_success()
+            return response
+
+
+async def acall_with_retries(create, limiter=None, breaker=None, tokens=0, max_retries=3, backoff_base=0.5,
+                             backoff_max=20.0, timeout=None, deadline=None, **kwargs):
+    """Async version of call_with_retries
+
+    timeout caps each attempt (seconds, passed to the client) and deadline
+    the whole call, waits and retries included; past the deadline
+    DeadlineExceeded is raised instead of retrying.
+    """
+    give_up_at = time.monotonic() + deadline if deadline else None
+    for attempt in range(max_retries + 1):
+        if breaker:
+            breaker.check()
+        if limiter:
+            await limiter.aacquire(tokens)
+        attempt_timeout = timeout
+        if give_up_at is not None:
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"OpenAI call did not finish within {deadline}s")
+            attempt_timeout = min(timeout, remaining) if timeout else remaining
+        try:
+            if attempt_timeout is None:
+                response = await create(**kwargs)
+            else:
+                response = await asyncio.wait_for(create(timeout=attempt_timeout, **kwargs), attempt_timeout)
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError) and not isinstance(e, DeadlineExceeded):
+                e = DeadlineExceeded(f"OpenAI call timed out after {attempt_timeout:.1f}s")
+            if breaker:
+                # Only upstream trouble counts, a rejected input means the service is up
+                if isinstance(e, RETRYABLE_ERRORS + (DeadlineExceeded,)):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            if attempt == max_retries or not (is_retryable(e) or isinstance(e, DeadlineExceeded)):
+                raise e
+            delay = backoff_delay(attempt, e, backoff_base, backoff_max)
+            if give_up_at is not None and time.monotonic() + delay >= give_up_at:
+                # Waiting would run past the deadline
+                raise e
+            print(f"OpenAI request failed ({e.__class__.__name__}), retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+        else:
+            if breaker:
+                breaker.record_success()
+            return response
@@ -0,0 +1,151 @@
+"""
+Compact vector codes for the NumPy vector store
+int8 scalar quantization (4x smaller than float32) and product quantization
+(one byte per subspace); approximate scores pick a shortlist that is rescored
+with the exact float vectors
+"""
+
+import numpy as np
+
+# Rows encoded or scored at a time, to keep temporary arrays small
+BLOCK_ROWS = 4096
+
+# Vectors sampled to train the quantizers
+TRAIN_SAMPLE = 20000
+
+
+def _sample(vectors, rng):
+    """Random sample of rows for training"""
+    size = min(len(vectors), TRAIN_SAMPLE)
+    rows = np.sort(rng.choice(len(vectors), size, replace=False))
+    return np.asarray(vectors[rows], dtype=np.float32)
+
+
+def _kmeans(points, k, rng, iterations=10):
+    """Euclidean k-means, returning the centroids"""
+    centroids = points[rng.choice(len(points), k, replace=False)].copy()
+    for _ in range(iterations):
+        # argmin |x - c|^2 == argmax (x.c - |c|^2 / 2)
+        labels = np.argmax(points @ centroids.T - 0.5 * np.sum(centroids ** 2, axis=1), axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points)
+        counts = np.bincount(labels, minlength=k)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class ScalarQuantizer:
+    """int8 codes with one symmetric scale per dimension"""
+
+    kind = "int8"
+
+    def __init__(self, scale=None):
+        self.scale = scale
+
+    def train(self, vectors, seed=0):
+        """Fit the per-dimension scales"""
+        sample = _sample(vectors, np.random.default_rng(seed))
+        max_abs = np.max(np.abs(sample), axis=0)
+        max_abs[max_abs == 0] = 1.0
+        self.scale = (max_abs / 127).astype(np.float32)
+
+    def encode(self, vectors):
+        """Encode rows as int8 codes"""
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            codes[start:start + len(block)] = np.clip(np.rint(block / self.scale), -127, 127)
+        return codes
+
+    def scores(self, codes, query):
+        """Approximate dot products of the encoded rows with a query"""
+        scaled_query = query * self.scale
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            scores[start:start + BLOCK_ROWS] = codes[start:start + BLOCK_ROWS].astype(np.float32) @ scaled_query
+        return scores
+
+    @property
+    def dim(self):
+        """Vector dimension the quantizer was trained for"""
+        return len(self.scale)
+
+    def state(self):
+        """Arrays needed to restore the quantizer"""
+        return {"scale": self.scale}
+
+
+class ProductQuantizer:
+    """Product quantization: each subspace is encoded as one of 256 centroids"""
+
+    kind = "pq"
+
+    def __init__(self, n_subspaces=16, centroids=None):
+        self.n_subspaces = n_subspaces
+        self.centroids = centroids  # (n_subspaces, n_centroids, subspace_dim)
+
+    def _split(self, vectors):
+        """View rows as (rows, n_subspaces, subspace_dim)"""
+        if vectors.shape[1] % self.n_subspaces:
+            raise ValueError(
+                f"Vector dimension {vectors.shape[1]} is not divisible by {self.n_subspaces} subspaces"
+            )
+        return vectors.reshape(len(vectors), self.n_subspaces, -1)
+
+    def train(self, vectors, seed=0):
+        """Fit the centroids of each subspace"""
+        rng = np.random.default_rng(seed)
+        sample = self._split(_sample(vectors, rng))
+        n_centroids = min(256, len(sample))
+        self.centroids = np.stack([
+            _kmeans(sample[:, subspace], n_centroids, rng) for subspace in range(self.n_subspaces)
+        ]).astype(np.float32)
+
+    def encode(self, vectors):
+        """Encode rows as one uint8 centroid index per subspace"""
+        codes = np.empty((len(vectors), self.n_subspaces), dtype=np.uint8)
+        half_norms = 0.5 * np.sum(self.centroids ** 2, axis=2)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            block = self._split(np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32))
+            for subspace in range(self.n_subspaces):
+                codes[start:start + len(block), subspace] = np.argmax(
+                    block[:, subspace] @ self.centroids[subspace].T - half_norms[subspace], axis=1
+                )
+        return codes
+
+    def scores(self, codes, query):
+        """Approximate dot products from per-subspace lookup tables"""
+        lookup = np.einsum("skd,sd->sk", self.centroids, query.reshape(self.n_subspaces, -1))
+        subspaces = np.arange(self.n_subspaces)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            scores[start:start + BLOCK_ROWS] = lookup[subspaces, codes[start:start + BLOCK_ROWS]].sum(axis=1)
+        return scores
+
+    @property
+    def dim(self):
+        """Vector dimension the quantizer was trained for"""
+        return self.centroids.shape[0] * self.centroids.shape[2]
+
+    def state(self):
+        """Arrays needed to restore the quantizer"""
+        return {"centroids": self.centroids}
+
+
+def create_quantizer(kind, n_subspaces=16):
+    """Create an untrained quantizer by name ("int8" or "pq")"""
+    if kind == "int8":
+        return ScalarQuantizer()
+    if kind == "pq":
+        return ProductQuantizer(n_subspaces=n_subspaces)
+    raise ValueError(f"Unknown quantization: {kind}")
+
+
+def load_quantizer(kind, state):
+    """Restore a trained quantizer from its saved arrays"""
+    if kind == "int8":
+        return ScalarQuantizer(scale=state["scale"])
+    if kind == "pq":
+        return ProductQuantizer(n_subspaces=len(state["centroids"]), centroids=state["centroids"])
+    raise ValueError(f"Unknown quantization: {kind}")
@@ -0,0 +1,71 @@
+"""
+Popular query log
+Counts the questions asked, so a freshly started worker can warm up with the
+most popular ones. Counts are kept in memory and merged into a small JSON
+file shared by all workers, under a file lock.
+"""
+
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from file_lock import FileLock
+
+
+class QueryLog:
+    def __init__(self, path="./cache/query_log.json", max_entries=1000):
+        """Create a query log backed by a JSON file (None keeps it in memory)"""
+        self.path = path
+        self.max_entries = max_entries
+        self._pending = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, query):
+        """Count one occurrence of a query"""
+        # Same normalization as embedding_cache.normalize_text (which would pull in numpy)
+        query = " ".join(unicodedata.normalize("NFC", query).split())
+        if query:
+            with self._lock:
+                self._pending[query] += 1
+
+    def _read(self):
+        """Counts saved in the file (empty if missing or unreadable)"""
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f).get("counts", {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def save(self):
+        """Merge the counts recorded since the last save into the file
+
+        Only the max_entries most frequent queries are kept. The file is
+        locked while it is read and rewritten, so workers saving at the same
+        time don't drop each other's counts.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+        with FileLock(f"{self.path}.lock"):
+            counts = Counter(self._read())
+            counts.update(pending)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"updated_at": time.time(), "counts": dict(counts.most_common(self.max_entries))},
+                          f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def popular(self, n=20):
+        """The n most frequent queries, saved and not yet saved"""
+        counts = Counter(self._read())
+        with self._lock:
+            counts.update(self._pending)
+        return [query for query, _ in counts.most_common(n)]
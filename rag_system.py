@@ -5,109 +5,882 @@ Specialized for Polish sauce recipes
 """
 
 import os
+import time
+import asyncio
+import hashlib
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import openai
-import chromadb
 from dotenv import load_dotenv
 from sample_documents import SAMPLE_DOCUMENTS
+from token_counter import count_tokens
+from embedding_cache import EmbeddingCache
+from answer_cache import SemanticAnswerCache
+from vector_store import create_vector_store, matches_where
+from chunking import chunk_document, chunk_ids, merge_adjacent_chunks
+from context_packing import pack_context
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from rerank import Reranker, create_scorer
+from recipe_attributes import ATTRIBUTES_VERSION, extract_attributes
+from embedding_providers import DEFAULT_LOCAL_MODEL, create_embedding_provider
+from metrics import record_usage, span
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from openai_transport import (
+    RateLimiter, acall_with_retries, call_with_retries, create_http_clients
+)
 
 # Load environment variables
 load_dotenv()
 
+# Embedding model of indexes written before the model was recorded in their metadata
+EMBEDDING_MODEL = "text-embedding-ada-002"
+CHAT_MODEL = "gpt-3.5-turbo"
+
+RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+
+# Corpus tag of records synced from the application corpus; records written
+# before corpora were tagged belong to it too
+DEFAULT_CORPUS = "default"
+
+# Lexical candidates fetched per result in filtered hybrid search, before
+# those failing the filter are dropped
+LEXICAL_FILTER_OVERFETCH = 4
+
+# OpenAI embeddings API limits
+EMBEDDING_MAX_INPUTS = 2048
+EMBEDDING_MAX_INPUT_TOKENS = 8191
+
+# Completion length limit, also counted against the token rate limit
+ANSWER_MAX_TOKENS = 200
+
+
+class AnswerStreamError(Exception):
+    """Raised when a streamed answer fails; the message is the user-facing error"""
+
+
+def content_hash(text):
+    """Hash of a document's content, stored in metadata to detect edits"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def record_hash(record):
+    """Content hash of a stored record
+
+    Chunks of multi-chunk documents also hash their position, so that the
+    chunk metadata is rewritten when a document is re-chunked.
+    """
+    metadata = record.get("metadata", {})
+    if metadata.get("chunk_count", 1) == 1:
+        return content_hash(record["content"])
+    return content_hash(f"{record['content']}\n#{metadata['chunk_index']}/{metadata['chunk_count']}")
+
+
+def corpus_fingerprint(documents, settings=""):
+    """Hash of all (id, content hash) pairs in a corpus and the ingestion settings"""
+    digest = hashlib.sha256(settings.encode("utf-8"))
+    for doc in sorted(documents, key=lambda doc: doc["id"]):
+        digest.update(f"{doc['id']}:{content_hash(doc['content'])}\n".encode("utf-8"))
+    return digest.hexdigest()
+
 
 class SimpleRAGSystem:
-    def __init__(self):
-        """Initialize the RAG system with ChromaDB and OpenAI"""
+    def __init__(self, embedding_batch_size=None, embedding_batch_max_tokens=None,
+                 write_batch_size=None, max_retries=None, embedding_cache_path=None,
+                 embedding_cache_max_entries=None, sync_page_size=None,
+                 max_concurrent_requests=None, chroma_threads=None, answer_cache_max_entries=None,
+                 vector_store=None, chunk_max_tokens=None, chunk_overlap_tokens=None,
+                 context_max_tokens=None, retrieval_mode=None, lexical_index_path=None,
+                 read_only=False, rerank=None, rerank_candidates=None, embedding_provider=None):
+        """Initialize the RAG system with ChromaDB and OpenAI
+
+        A read-only system opens the existing index for querying only and
+        never writes to it, so several server workers can share it. rerank
+        is a scorer name ("lexical", "cross-encoder") or an object with a
+        score(query, documents) method; "off" disables reranking.
+        embedding_provider is "openai", "local" or an object with a model
+        name and embed / aembed methods (see embedding_providers.py).
+        """
+        self.read_only = read_only
+
+        # Batched ingestion settings
+        self.embedding_batch_size = min(
+            embedding_batch_size or int(os.getenv("EMBEDDING_BATCH_SIZE", 256)),
+            EMBEDDING_MAX_INPUTS
+        )
+        self.embedding_batch_max_tokens = embedding_batch_max_tokens or int(
+            os.getenv("EMBEDDING_BATCH_MAX_TOKENS", 100000)
+        )
+        self.write_batch_size = write_batch_size or int(os.getenv("CHROMA_WRITE_BATCH_SIZE", 1000))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("OPENAI_MAX_RETRIES", 3))
+        self.sync_page_size = sync_page_size or int(os.getenv("CHROMA_SYNC_PAGE_SIZE", 5000))
+
+        # Chunking settings (a chunk size of 0 embeds documents whole)
+        if chunk_max_tokens is None:
+            chunk_max_tokens = int(os.getenv("CHUNK_MAX_TOKENS", 400))
+        self.chunk_max_tokens = min(chunk_max_tokens, EMBEDDING_MAX_INPUT_TOKENS)
+        self.chunk_overlap_tokens = chunk_overlap_tokens if chunk_overlap_tokens is not None else int(
+            os.getenv("CHUNK_OVERLAP_TOKENS", 50)
+        )
+
+        # Token budget for the context documents in the answer prompt
+        self.context_max_tokens = context_max_tokens or int(os.getenv("CONTEXT_MAX_TOKENS", 1500))
+
         # Set up OpenAI
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("Please set your OPENAI_API_KEY in a .env file")
 
-        # Initialize OpenAI client with explicit API key
-        try:
-            self.client = openai.OpenAI(api_key=api_key)
-        except Exception as e:
-            # Fallback for older OpenAI versions
-            openai.api_key = api_key
-            self.client = openai.OpenAI()
+        # Initialize OpenAI clients on shared keep-alive connection pools.
+        # Retries are handled by call_with_retries, so the SDK's are disabled.
+        timeout = float(os.getenv("OPENAI_TIMEOUT_SECONDS", 30))
+        self.http_client, self.async_http_client = create_http_clients(
+            timeout=timeout,
+            connect_timeout=float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", 5)),
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", 32)),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 16)),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", 60))
+        )
+        self.client = openai.OpenAI(
+            api_key=api_key, http_client=self.http_client, max_retries=0, timeout=timeout
+        )
+        self.async_client = openai.AsyncOpenAI(
+            api_key=api_key, http_client=self.async_http_client, max_retries=0, timeout=timeout
+        )
+        self.backoff_base = float(os.getenv("OPENAI_BACKOFF_BASE_SECONDS", 0.5))
+        self.backoff_max = float(os.getenv("OPENAI_BACKOFF_MAX_SECONDS", 20))
+        # Calls a user waits on (the async request path) give up sooner; an
+        # overall deadline caps the attempts, waits and retries together
+        self.request_retry_settings = {
+            "max_retries": int(os.getenv("OPENAI_REQUEST_MAX_RETRIES", 1)),
+            "backoff_base": self.backoff_base,
+            "backoff_max": float(os.getenv("OPENAI_REQUEST_BACKOFF_MAX_SECONDS", 2)),
+            "timeout": float(os.getenv("OPENAI_REQUEST_TIMEOUT_SECONDS", 10)),
+            "deadline": float(os.getenv("OPENAI_REQUEST_DEADLINE_SECONDS", 15))
+        }
+
+        # Client-side rate limits matching the account quotas (0 = unlimited),
+        # split across the server worker processes sharing them
+        limiter_shares = int(os.getenv("OPENAI_RATE_LIMIT_SHARES") or os.getenv("WEB_CONCURRENCY") or 1)
+        self.embedding_limiter = RateLimiter(
+            requests_per_minute=int(os.getenv("OPENAI_EMBEDDING_RPM", 0)),
+            tokens_per_minute=int(os.getenv("OPENAI_EMBEDDING_TPM", 0)),
+            shares=limiter_shares
+        )
+        self.chat_limiter = RateLimiter(
+            requests_per_minute=int(os.getenv("OPENAI_CHAT_RPM", 0)),
+            tokens_per_minute=int(os.getenv("OPENAI_CHAT_TPM", 0)),
+            shares=limiter_shares
+        )
+
+        # Circuit breakers: stop calling OpenAI for a while when most calls fail
+        breaker_settings = {
+            "failure_rate": float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", 0.5)),
+            "min_calls": int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", 10)),
+            "window_seconds": float(os.getenv("CIRCUIT_BREAKER_WINDOW_SECONDS", 60)),
+            "open_seconds": float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", 30))
+        }
+        self.embedding_breaker = CircuitBreaker("embeddings", **breaker_settings)
+        self.chat_breaker = CircuitBreaker("chat", **breaker_settings)
+
+        # Embedding provider: OpenAI (default) or a local CPU model
+        embedding_provider = embedding_provider or os.getenv("EMBEDDING_PROVIDER", "openai")
+        if embedding_provider == "openai":
+            embedding_provider = create_embedding_provider(
+                "openai",
+                client=self.client,
+                async_client=self.async_client,
+                limiter=self.embedding_limiter,
+                breaker=self.embedding_breaker,
+                max_retries=self.max_retries,
+                backoff_base=self.backoff_base,
+                backoff_max=self.backoff_max,
+                request_retry_settings=self.request_retry_settings
+            )
+        elif isinstance(embedding_provider, str):
+            embedding_provider = create_embedding_provider(
+                embedding_provider,
+                model=os.getenv("LOCAL_EMBEDDING_MODEL", DEFAULT_LOCAL_MODEL),
+                backend=os.getenv("LOCAL_EMBEDDING_BACKEND", "torch"),
+                threads=int(os.getenv("LOCAL_EMBEDDING_THREADS", 0)) or None
+            )
+        self.embedder = embedding_provider
+        self.embedding_model = embedding_provider.model
+
+        # Concurrency limits for the API request path
+        self._openai_semaphore = asyncio.Semaphore(
+            max_concurrent_requests or int(os.getenv("OPENAI_MAX_CONCURRENT_REQUESTS", 16))
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=chroma_threads or int(os.getenv("CHROMA_MAX_THREADS", 4)),
+            thread_name_prefix="rag-blocking"
+        )
 
-        # Set up ChromaDB with persistent storage
-        self.chroma_client = chromadb.PersistentClient(path="./chroma")
+        # Set up the vector store (ChromaDB with persistent storage by default)
+        if vector_store is None:
+            backend = os.getenv("VECTOR_STORE", "chroma")
+            if backend == "numpy":
+                vector_store = create_vector_store(
+                    "numpy",
+                    path=os.getenv("VECTOR_INDEX_PATH", "./vector_index"),
+                    ivf_clusters=int(os.getenv("VECTOR_INDEX_IVF_CLUSTERS", 0)),
+                    nprobe=int(os.getenv("VECTOR_INDEX_NPROBE", 8)),
+                    quantization=os.getenv("VECTOR_INDEX_QUANTIZATION", "none"),
+                    pq_subspaces=int(os.getenv("VECTOR_INDEX_PQ_SUBSPACES", 16)),
+                    rescore_candidates=int(os.getenv("VECTOR_INDEX_RESCORE_CANDIDATES", 50)),
+                    read_only=read_only
+                )
+            else:
+                vector_store = create_vector_store(
+                    backend, path="./chroma", name=os.getenv("CHROMA_COLLECTION", "sauce_recipes"),
+                    read_only=read_only
+                )
+        self.store = vector_store
+        self._check_embedding_model()
 
-        # Create or get collection
-        self.collection = self.chroma_client.get_or_create_collection(
-            name="sauce_recipes",
-            metadata={"description": "A collection of Polish sauce recipes"}
+        # BM25 index for hybrid retrieval and the lexical-only fallback
+        self.retrieval_mode = retrieval_mode or os.getenv("RETRIEVAL_MODE", "hybrid")
+        if self.retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"RETRIEVAL_MODE must be one of: {', '.join(RETRIEVAL_MODES)}")
+        self.bm25_index = BM25Index(
+            path=lexical_index_path or os.getenv("BM25_INDEX_PATH", "./cache/bm25_index.json")
         )
-        
+        if self.bm25_index.count() != self.store.count():
+            self._rebuild_lexical_index()
+
+        # Optional rerank stage over over-fetched candidates
+        rerank = rerank or os.getenv("RERANK", "off")
+        if rerank == "off":
+            self.reranker = None
+        else:
+            if isinstance(rerank, str):
+                kwargs = {"model_name": os.getenv("RERANK_MODEL")} if os.getenv("RERANK_MODEL") else {}
+                rerank = create_scorer(rerank, **kwargs)
+            self.reranker = Reranker(
+                rerank, max_candidates=rerank_candidates or int(os.getenv("RERANK_CANDIDATES", 20))
+            )
+
+        # Set up the on-disk embedding cache (disabled with a size cap of 0)
+        if embedding_cache_max_entries is None:
+            embedding_cache_max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 100000))
+        if embedding_cache_max_entries > 0:
+            self.embedding_cache = EmbeddingCache(
+                path=embedding_cache_path or os.getenv("EMBEDDING_CACHE_PATH", "./cache/embeddings.sqlite3"),
+                max_entries=embedding_cache_max_entries
+            )
+        else:
+            self.embedding_cache = None
+
+        # Set up the in-memory semantic answer cache (disabled with a size cap of 0)
+        if answer_cache_max_entries is None:
+            answer_cache_max_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))
+        if answer_cache_max_entries > 0:
+            self.answer_cache = SemanticAnswerCache(
+                similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.97)),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 3600)),
+                max_entries=answer_cache_max_entries
+            )
+        else:
+            self.answer_cache = None
+
         print("Sauce Recipe RAG System initialized successfully!")
     
+    def _check_embedding_model(self):
+        """Make sure the index only holds vectors of the configured embedding model
+
+        The model is recorded in the collection metadata on first use. Indexes
+        written before it was recorded hold ada-002 vectors.
+        """
+        metadata = self.store.metadata
+        stored_model = metadata.get("embedding_model") or (EMBEDDING_MODEL if self.store.count() else None)
+        if stored_model is not None and stored_model != self.embedding_model:
+            raise ValueError(
+                f"The index holds {stored_model} embeddings, not {self.embedding_model}; use a separate "
+                f"collection (CHROMA_COLLECTION or VECTOR_INDEX_PATH) for this embedding model"
+            )
+        if "embedding_model" not in metadata and not self.read_only:
+            metadata["embedding_model"] = self.embedding_model
+            self.store.set_metadata(metadata)
+
+    def _create_embeddings(self, texts):
+        """Embed texts with the embedding provider"""
+        with span("embedding"):
+            return self.embedder.embed(texts)
+
+    def _create_completion(self, messages):
+        """Call the chat completions API with retries and rate limiting"""
+        return call_with_retries(
+            self.client.chat.completions.create,
+            limiter=self.chat_limiter,
+            breaker=self.chat_breaker,
+            tokens=self._completion_tokens(messages),
+            max_retries=self.max_retries,
+            backoff_base=self.backoff_base,
+            backoff_max=self.backoff_max,
+            model=CHAT_MODEL,
+            messages=messages,
+            max_tokens=ANSWER_MAX_TOKENS,
+            temperature=0.7
+        )
+
+    @staticmethod
+    def _completion_tokens(messages):
+        """Tokens a completion counts against the rate limit (prompt + answer)"""
+        return sum(count_tokens(message["content"], CHAT_MODEL) for message in messages) + ANSWER_MAX_TOKENS
+
     def get_embedding(self, text):
-        """Get embeddings from OpenAI"""
+        """Get the embedding of a text (served from the cache when possible)"""
+        if self.embedding_cache:
+            cached = self.embedding_cache.get(self.embedding_model, text)
+            if cached is not None:
+                return cached
+
         try:
-            response = self.client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=text
-            )
-            return response.data[0].embedding
+            embedding = self._create_embeddings([text])[0]
         except Exception as e:
             print(f"Error getting embedding: {e}")
             return None
-    
-    def add_documents(self, documents):
-        """Add documents to the ChromaDB collection"""
-        print("Adding documents to the database...")
 
-        # Check existing documents to avoid duplicates
+        if self.embedding_cache:
+            self.embedding_cache.set(self.embedding_model, text, embedding)
+        return embedding
+
+    def get_embeddings(self, texts):
+        """Get embeddings for a list of texts in a single provider request
+
+        Cached texts are not sent to the API. Unlike get_embedding, errors
+        are raised so callers can retry.
+        """
+        if self.embedding_cache:
+            embeddings = self.embedding_cache.get_many(self.embedding_model, texts)
+        else:
+            embeddings = [None] * len(texts)
+
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            fetched = self._create_embeddings([texts[i] for i in missing])
+            for i, embedding in zip(missing, fetched):
+                embeddings[i] = embedding
+            if self.embedding_cache:
+                self.embedding_cache.set_many(self.embedding_model, [texts[i] for i in missing], fetched)
+
+        return embeddings
+
+    def _make_embedding_batches(self, documents):
+        """Split documents into batches respecting the embeddings API limits"""
+        batch, batch_tokens = [], 0
+        for doc, tokens in documents:
+            if batch and (len(batch) >= self.embedding_batch_size
+                          or batch_tokens + tokens > self.embedding_batch_max_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append((doc, tokens))
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _embed_batch(self, batch):
+        """Embed a batch, retrying only the items that failed
+
+        Transient API errors are retried with backoff by the transport layer;
+        if they persist the whole batch fails. A rejected request (400) splits
+        the batch in halves so that a single bad input does not take the whole
+        batch down with it; other errors (authentication, open circuit, ...)
+        would fail every half too, so they fail the batch. Returns (embedded,
+        failed) where embedded is a list of (doc, tokens, embedding) tuples.
+        """
         try:
-            existing_docs = self.collection.get()
-            existing_ids = set(existing_docs["ids"]) if existing_docs["ids"] else set()
-        except Exception:
-            existing_ids = set()
+            embeddings = self.get_embeddings([doc["content"] for doc, _ in batch])
+            return [(doc, tokens, emb) for (doc, tokens), emb in zip(batch, embeddings)], []
+        except Exception as e:
+            if len(batch) > 1 and isinstance(e, openai.BadRequestError):
+                middle = len(batch) // 2
+                left_ok, left_failed = self._embed_batch(batch[:middle])
+                right_ok, right_failed = self._embed_batch(batch[middle:])
+                return left_ok + right_ok, left_failed + right_failed
+
+            print(f"Error getting embeddings for {len(batch)} documents: {e}")
+            return [], [doc["id"] for doc, _ in batch]
+
+    @staticmethod
+    def _record_metadata(doc):
+        """Metadata stored with a record"""
+        return {**doc.get("metadata", {"source": doc["id"]}), "content_hash": record_hash(doc)}
+
+    def _write_batch(self, embedded):
+        """Upsert embedded documents into the vector store in one call"""
+        self.store.upsert(
+            embeddings=[emb for _, _, emb in embedded],
+            documents=[doc["content"] for doc, _, _ in embedded],
+            metadatas=[self._record_metadata(doc) for doc, _, _ in embedded],
+            ids=[doc["id"] for doc, _, _ in embedded]
+        )
 
-        added_count = 0
+    def _get_stored_metadatas(self, ids=None):
+        """Get {id: metadata} for stored records without loading documents
+
+        With ids only those records are looked up, otherwise the whole
+        collection is scanned page by page.
+        """
+        metadatas = {}
+        if ids is not None:
+            for start in range(0, len(ids), self.sync_page_size):
+                page = self.store.get_metadatas(ids=ids[start:start + self.sync_page_size])
+                for record_id, metadata in zip(page["ids"], page["metadatas"]):
+                    metadatas[record_id] = metadata or {}
+            return metadatas
+
+        offset = 0
+        while True:
+            page = self.store.get_metadatas(limit=self.sync_page_size, offset=offset)
+            for record_id, metadata in zip(page["ids"], page["metadatas"]):
+                metadatas[record_id] = metadata or {}
+            if len(page["ids"]) < self.sync_page_size:
+                return metadatas
+            offset += self.sync_page_size
+
+    def _chunk_documents(self, documents, corpus=DEFAULT_CORPUS):
+        """Split documents into chunk records carrying the document's recipe attributes
+
+        Without chunking each document is a single record. Every record is
+        tagged with the corpus it belongs to.
+        """
+        chunks = []
         for doc in documents:
-            if doc["id"] in existing_ids:
-                print(f"Document {doc['id']} already exists, skipping...")
+            attributes = {**extract_attributes(doc["content"]), "corpus": corpus}
+            if not self.chunk_max_tokens:
+                metadata = {"source": doc["id"], **doc.get("metadata", {}), **attributes}
+                chunks.append({**doc, "metadata": metadata})
                 continue
-                
-            # Get embedding for the document
-            embedding = self.get_embedding(doc["content"])
-            if embedding:
-                # Add to ChromaDB
-                self.collection.add(
-                    embeddings=[embedding],
-                    documents=[doc["content"]],
-                    metadatas=[{"source": doc["id"]}],
-                    ids=[doc["id"]]
-                )
-                print(f"Added document: {doc['id']}")
-                added_count += 1
+            for chunk in chunk_document(doc, self.chunk_max_tokens, self.chunk_overlap_tokens):
+                chunk["metadata"].update(attributes)
+                chunks.append(chunk)
+        return chunks
 
-        if added_count > 0:
-            print(f"Successfully added {added_count} new documents to the database.")
+    def _find_stale_chunks(self, documents, chunks, stored_metadatas):
+        """Find chunk records of the given documents that are no longer produced"""
+        current_ids = {chunk["id"] for chunk in chunks}
+        stale_ids = []
+        for doc in documents:
+            previous_count = 0
+            for record_id in (doc["id"], f"{doc['id']}#0"):
+                if record_id in stored_metadatas:
+                    previous_count = stored_metadatas[record_id].get("chunk_count", 1)
+            stale_ids.extend(
+                record_id for record_id in chunk_ids(doc["id"], previous_count)
+                if previous_count and record_id not in current_ids
+            )
+        return stale_ids
+
+    def _set_corpus_fingerprint(self, fingerprint):
+        """Record the fingerprint of the last fully synced corpus"""
+        metadata = self.store.metadata
+        if metadata.get("corpus_fingerprint", "") == fingerprint:
+            return
+        metadata["corpus_fingerprint"] = fingerprint
+        self.store.set_metadata(metadata)
+
+    def _check_writable(self):
+        """Raise if the system was opened read-only"""
+        if self.read_only:
+            raise RuntimeError("The RAG system was opened read-only, run ingestion with ingest.py")
+
+    def add_documents(self, documents, progress=None, persist=True, corpus=DEFAULT_CORPUS):
+        """Add new or changed documents to the vector store
+
+        Unchanged documents (same id and content hash) are skipped. Records
+        are tagged with `corpus`, so a sync of another corpus leaves them be.
+        progress(done, total) is called as records are embedded and written.
+        With persist=False the store and the lexical index are not flushed
+        to disk (call persist() later), for loading many batches in a row.
+        Returns a dict with ingestion statistics and throughput.
+        """
+        self._check_writable()
+        print("Adding documents to the database...")
+        return self._ingest(documents, prune=False, progress=progress, persist=persist, corpus=corpus)
+
+    def persist(self):
+        """Flush the vector store and the lexical index to disk"""
+        self._check_writable()
+        self.store.persist()
+        self.bm25_index.save()
+
+    def checkpoint(self):
+        """Make the records written so far durable without rewriting the indexes
+
+        The vector store journals the changed records and the saved lexical
+        index is dropped, so it is rebuilt from the store if the process stops
+        before the next persist().
+        """
+        self._check_writable()
+        self.store.persist(compact=False)
+        self.bm25_index.discard()
+
+    def sync_documents(self, documents, progress=None, corpus=DEFAULT_CORPUS):
+        """Make the records of a corpus match the given documents
+
+        New and changed documents are upserted and records of the corpus that
+        are no longer in it are deleted; records of other corpora (e.g. bulk
+        loads) are kept. If the corpus fingerprint matches the last
+        successful sync the collection is not scanned at all.
+        """
+        self._check_writable()
+        print("Syncing documents with the database...")
+        documents = list({doc["id"]: doc for doc in documents}.values())
+        fingerprint = corpus_fingerprint(
+            documents,
+            settings=f"chunking:{self.chunk_max_tokens}:{self.chunk_overlap_tokens}:attributes:{ATTRIBUTES_VERSION}"
+                     f":corpus:{corpus}"
+        )
+
+        if self.store.metadata.get("corpus_fingerprint") == fingerprint:
+            print("All documents are up to date.")
+            return {
+                "added": 0, "updated": 0, "deleted": 0, "skipped": len(documents),
+                "failed": 0, "failed_ids": [], "seconds": 0.0,
+                "docs_per_sec": 0.0, "tokens_per_sec": 0.0
+            }
+
+        stats = self._ingest(documents, prune=True, progress=progress, corpus=corpus)
+        self._set_corpus_fingerprint(fingerprint if not stats["failed"] else "")
+        return stats
+
+    def _ingest(self, documents, prune, progress=None, persist=True, corpus=DEFAULT_CORPUS):
+        """Embed and upsert new or changed documents, optionally deleting the rest of the corpus"""
+        start_time = time.perf_counter()
+        documents = list({doc["id"]: doc for doc in documents}.values())
+        chunks = self._chunk_documents(documents, corpus)
+
+        # Compare content hashes with what is stored to find new and changed records
+        try:
+            if prune:
+                stored_metadatas = self._get_stored_metadatas()
+            else:
+                lookup_ids = {chunk["id"] for chunk in chunks}
+                for doc in documents:
+                    lookup_ids.update((doc["id"], f"{doc['id']}#0"))
+                stored_metadatas = self._get_stored_metadatas(sorted(lookup_ids))
+        except Exception as e:
+            print(f"Error reading existing documents: {e}")
+            stored_metadatas = {}
+        stored_hashes = {
+            record_id: metadata.get("content_hash") for record_id, metadata in stored_metadatas.items()
+        }
+
+        pending = []
+        failed_ids = []
+        # Unchanged records with attributes from an older extraction (or another
+        # corpus tag) only get new metadata
+        outdated = []
+        skipped_count = 0
+        new_count = 0
+        for doc in chunks:
+            if doc["id"] in stored_hashes:
+                if stored_hashes[doc["id"]] == record_hash(doc):
+                    stored = stored_metadatas[doc["id"]]
+                    if (stored.get("attributes_version") == ATTRIBUTES_VERSION
+                            and stored.get("corpus", DEFAULT_CORPUS) == corpus):
+                        skipped_count += 1
+                    else:
+                        outdated.append(doc)
+                    continue
+            else:
+                new_count += 1
+
+            tokens = count_tokens(doc["content"])
+            if tokens > EMBEDDING_MAX_INPUT_TOKENS:
+                print(f"Document {doc['id']} is too long to embed ({tokens} tokens), skipping...")
+                failed_ids.append(doc["id"])
+                continue
+            pending.append((doc, tokens))
+
+        if skipped_count:
+            print(f"{skipped_count} documents are unchanged, skipping...")
+
+        # Same content, so the stored embeddings stay
+        refreshed_count = 0
+        for start in range(0, len(outdated), self.write_batch_size):
+            batch = outdated[start:start + self.write_batch_size]
+            self.store.update_metadatas(
+                ids=[doc["id"] for doc in batch], metadatas=[self._record_metadata(doc) for doc in batch]
+            )
+            refreshed_count += len(batch)
+        if refreshed_count:
+            print(f"Updated the attributes of {refreshed_count} unchanged documents.")
+
+        written_count = 0
+        embedded_tokens = 0
+        processed_count = 0
+        to_write = []
+
+        def report(count):
+            # Progress counts records embedded (or failed), writes follow in batches
+            nonlocal processed_count
+            processed_count += count
+            if progress:
+                progress(processed_count, len(pending))
+
+        def flush(embedded):
+            nonlocal written_count, embedded_tokens
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self._write_batch(embedded)
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        print(f"Error writing {len(embedded)} documents to the database: {e}")
+                        failed_ids.extend(doc["id"] for doc, _, _ in embedded)
+                        return
+                    time.sleep(2 ** attempt)
+            self.bm25_index.add_documents(
+                [doc["id"] for doc, _, _ in embedded], [doc["content"] for doc, _, _ in embedded]
+            )
+            written_count += len(embedded)
+            embedded_tokens += sum(tokens for _, tokens, _ in embedded)
+            print(f"Written {written_count}/{len(pending)} documents...")
+
+        if pending and not prune:
+            # The collection no longer matches the last synced corpus
+            self._set_corpus_fingerprint("")
+
+        report(0)
+        for batch in self._make_embedding_batches(pending):
+            embedded, failed = self._embed_batch(batch)
+            failed_ids.extend(failed)
+            report(len(embedded) + len(failed))
+            to_write.extend(embedded)
+            while len(to_write) >= self.write_batch_size:
+                flush(to_write[:self.write_batch_size])
+                to_write = to_write[self.write_batch_size:]
+        if to_write:
+            flush(to_write)
+
+        if prune:
+            current_ids = {chunk["id"] for chunk in chunks}
+            removed_ids = [
+                record_id for record_id, metadata in stored_metadatas.items()
+                if record_id not in current_ids and metadata.get("corpus", DEFAULT_CORPUS) == corpus
+            ]
         else:
+            removed_ids = self._find_stale_chunks(documents, chunks, stored_metadatas)
+
+        deleted_count = 0
+        if removed_ids:
+            for start in range(0, len(removed_ids), self.write_batch_size):
+                self.store.delete(ids=removed_ids[start:start + self.write_batch_size])
+            self.bm25_index.remove_documents(removed_ids)
+            deleted_count = len(removed_ids)
+            print(f"Deleted {deleted_count} records that are no longer in the corpus.")
+
+        if persist:
+            self.store.persist()
+            if written_count or deleted_count:
+                self.bm25_index.save()
+
+        if self.answer_cache and (written_count or deleted_count or refreshed_count):
+            # Cached answers may be based on documents that just changed
+            self.answer_cache.clear()
+
+        failed_new = sum(1 for doc_id in failed_ids if doc_id not in stored_hashes)
+        added_count = new_count - failed_new
+        elapsed = time.perf_counter() - start_time
+        stats = {
+            "added": added_count,
+            "updated": written_count - added_count + refreshed_count,
+            "deleted": deleted_count,
+            "skipped": skipped_count,
+            "failed": len(failed_ids),
+            "failed_ids": failed_ids,
+            "seconds": round(elapsed, 3),
+            "docs_per_sec": round(written_count / elapsed, 2) if elapsed > 0 else 0.0,
+            "tokens_per_sec": round(embedded_tokens / elapsed, 2) if elapsed > 0 else 0.0
+        }
+
+        if written_count > 0:
+            print(f"Successfully added {stats['added']} new and updated {stats['updated']} documents "
+                  f"({stats['docs_per_sec']} docs/sec, {stats['tokens_per_sec']} tokens/sec).")
+        elif not failed_ids and not deleted_count:
             print("All documents already exist in the database.")
-    
-    def search_documents(self, query, n_results=3):
-        """Search for relevant documents based on query"""
+        if failed_ids:
+            print(f"❌ Failed to add {len(failed_ids)} documents: {', '.join(failed_ids)}")
+
+        return stats
+
+    def search_documents(self, query, n_results=3, mode=None, where=None):
+        """Search for relevant documents based on query
+
+        mode is "hybrid" (vector + BM25), "vector" or "lexical" (BM25 only,
+        no embedding request); it defaults to the configured retrieval mode.
+        If the query cannot be embedded, lexical search is used instead.
+        where is a metadata filter (see recipe_attributes.build_where) pushed
+        down into the vector store query.
+        """
+        mode = mode or self.retrieval_mode
         print(f"Searching for: '{query}'")
 
         # Get embedding for the query
-        query_embedding = self.get_embedding(query)
-        if not query_embedding:
-            print("❌ Could not generate embedding for query (likely due to API quota or connection issues)")
-            return {'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+        query_embedding = None
+        if mode != "lexical":
+            query_embedding = self.get_embedding(query)
+            if not query_embedding:
+                print("❌ Could not generate embedding for query (likely due to API quota or connection issues), "
+                      "falling back to lexical search")
 
-        # Search in ChromaDB
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
+        # Search in the vector store and the lexical index
+        results = self._retrieve(query, query_embedding, n_results, mode, where)
 
         return results
-    
-    def generate_answer(self, query, context_documents):
-        """Generate answer using OpenAI with retrieved context"""
+
+    def _retrieve(self, query, query_embedding, n_results, mode, where=None):
+        """Retrieve documents for a single query (see _retrieve_batch)"""
+        return self._retrieve_batch([query], [query_embedding], n_results, mode, where)[0]
+
+    def _retrieve_batch(self, queries, query_embeddings, n_results, mode, where=None):
+        """Retrieve documents with vector, lexical or hybrid search
+
+        All query embeddings are sent to the vector store in a single query.
+        Hybrid search fuses the vector and BM25 rankings with reciprocal rank
+        fusion. Queries without an embedding only use the BM25 index. With
+        chunking enabled twice as many chunks are fetched so that neighbouring
+        chunks can be merged and still fill n_results. With reranking enabled
+        up to the reranker's candidate cap is fetched and rescored first.
+        A where clause restricts both the vector and the lexical search to
+        matching records: lexical-only queries search the ids matching the
+        filter, while in hybrid search over-fetched BM25 candidates are
+        checked against their metadata, so the matching ids are not listed
+        on every request. Returns one result dict per query.
+        """
+        n_fetch = n_results * 2 if self.chunk_max_tokens else n_results
+        n_candidates = max(n_fetch, self.reranker.max_candidates) if self.reranker else n_fetch
+
+        embedded = [i for i, embedding in enumerate(query_embeddings) if embedding is not None]
+        vector_results = {}
+        if embedded:
+            with span("vector_search"):
+                found = self.store.query(
+                    query_embeddings=[query_embeddings[i] for i in embedded], n_results=n_candidates,
+                    where=where
+                )
+            for position, i in enumerate(embedded):
+                vector_results[i] = (
+                    found["ids"][position], found["documents"][position],
+                    found["metadatas"][position], found["distances"][position]
+                )
+
+        # The BM25 index has no metadata, so filtered lexical-only search is
+        # limited to the ids matching the filter
+        allowed_ids = None
+        if where and len(embedded) < len(queries):
+            with span("filter"):
+                allowed_ids = set(self.store.get_ids(where))
+
+        all_results = []
+        for i, query in enumerate(queries):
+            rankings = []
+            hits = {}
+            if i in vector_results:
+                ids, documents, metadatas, distances = vector_results[i]
+                for record_id, document, metadata, distance in zip(ids, documents, metadatas, distances):
+                    hits[record_id] = (document, metadata, distance)
+                rankings.append(ids)
+
+            if i not in vector_results:
+                with span("lexical_search"):
+                    rankings.append([doc_id for doc_id, _ in self.bm25_index.search(query, n_candidates, allowed_ids)])
+            elif mode == "hybrid" and where:
+                with span("lexical_search"):
+                    candidates = [
+                        doc_id for doc_id, _ in self.bm25_index.search(query, n_candidates * LEXICAL_FILTER_OVERFETCH)
+                    ]
+                rankings.append(self._filter_lexical_hits(candidates, where, hits)[:n_candidates])
+            elif mode == "hybrid":
+                with span("lexical_search"):
+                    rankings.append([doc_id for doc_id, _ in self.bm25_index.search(query, n_candidates)])
+
+            ranked_ids = reciprocal_rank_fusion(rankings) if len(rankings) > 1 else rankings[0]
+            ranked_ids = ranked_ids[:n_candidates]
+
+            # Lexical-only hits have no vector distance
+            missing = [record_id for record_id in ranked_ids if record_id not in hits]
+            if missing:
+                with span("document_fetch"):
+                    found = self.store.get_documents(ids=missing)
+                for record_id, document, metadata in zip(found["ids"], found["documents"], found["metadatas"]):
+                    hits[record_id] = (document, metadata, None)
+            ranked_ids = [record_id for record_id in ranked_ids if record_id in hits]
+
+            results = {
+                "ids": [ranked_ids],
+                "documents": [[hits[record_id][0] for record_id in ranked_ids]],
+                "metadatas": [[hits[record_id][1] for record_id in ranked_ids]],
+                "distances": [[hits[record_id][2] for record_id in ranked_ids]]
+            }
+            if self.reranker:
+                results = self.reranker.rerank(query, results, n_fetch)
+            if self.chunk_max_tokens:
+                results = merge_adjacent_chunks(results, n_results)
+            results["retrieval_mode"] = mode if i in vector_results else "lexical"
+            # Lexical fallback because the query could not be embedded
+            results["degraded"] = mode != "lexical" and i not in vector_results
+            results["query_embedding"] = query_embeddings[i]
+            all_results.append(results)
+        return all_results
+
+    def _filter_lexical_hits(self, candidate_ids, where, hits):
+        """Keep the lexical candidates matching a where clause, in order
+
+        Records not yet in hits are fetched once and added to them.
+        """
+        missing = [record_id for record_id in candidate_ids if record_id not in hits]
+        if missing:
+            with span("filter"):
+                found = self.store.get_documents(ids=missing)
+            for record_id, document, metadata in zip(found["ids"], found["documents"], found["metadatas"]):
+                if matches_where(metadata or {}, where):
+                    hits[record_id] = (document, metadata, None)
+        # Vector hits already match the filter
+        return [record_id for record_id in candidate_ids if record_id in hits]
+
+    def search_documents_batch(self, queries, n_results=3, mode=None, where=None):
+        """Search for many queries at once
+
+        All queries are embedded in one API request and the vector store is
+        queried with all embeddings in one call. Returns a list of search
+        results in the same format as search_documents.
+        """
+        mode = mode or self.retrieval_mode
+        print(f"Searching for {len(queries)} queries...")
+
+        query_embeddings = [None] * len(queries)
+        if mode != "lexical":
+            try:
+                query_embeddings = self.get_embeddings(queries)
+            except Exception as e:
+                print(f"❌ Could not generate embeddings for queries ({e}), falling back to lexical search")
+
+        return self._retrieve_batch(queries, query_embeddings, n_results, mode, where)
+
+    def _rebuild_lexical_index(self):
+        """Rebuild the BM25 index from the documents in the vector store"""
+        print("Building lexical search index...")
+        self.bm25_index.clear()
+        offset = 0
+        while True:
+            page = self.store.get_documents(limit=self.sync_page_size, offset=offset)
+            self.bm25_index.add_documents(page["ids"], page["documents"])
+            if len(page["ids"]) < self.sync_page_size:
+                break
+            offset += self.sync_page_size
+        if not self.read_only:
+            self.bm25_index.save()
+
+    def pack_context(self, context_documents):
+        """Deduplicate and fit context documents into the prompt token budget"""
+        with span("context_packing"):
+            return pack_context(context_documents, self.context_max_tokens, CHAT_MODEL)
+
+    def _build_messages(self, query, context_documents):
+        """Build the chat messages for a query and its context documents"""
         # Prepare context from retrieved documents
         context = "\n\n".join([doc for doc in context_documents])
 
@@ -121,26 +894,263 @@ Question: {query}
 
 Answer:"""
 
+        return [
+            {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided context."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _answer_error_message(self, e):
+        """Turn a completion error into a user-facing answer"""
+        if isinstance(e, CircuitOpenError):
+            return "❌ Answers are temporarily unavailable because of OpenAI API errors. Please try again later."
+        if isinstance(e, openai.RateLimitError):
+            if getattr(e, "code", None) == "insufficient_quota":
+                return "❌ OpenAI API quota exceeded. Please check your billing and usage limits at https://platform.openai.com/account/billing"
+            return "❌ OpenAI API rate limit reached. Please try again in a moment."
+        else:
+            print(f"Error generating answer: {e}")
+            return "❌ Sorry, I couldn't generate an answer due to an API error."
+
+    def generate_answer(self, query, context_documents):
+        """Generate answer using OpenAI with retrieved context"""
+        packed = self.pack_context(context_documents)
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided context."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200,
-                temperature=0.7
-            )
+            return self._complete_answer(query, packed["documents"])
+        except Exception as e:
+            return self._answer_error_message(e)
+
+    def _complete_answer(self, query, packed_documents):
+        """Generate an answer for already packed context, raising on errors"""
+        with span("generation"):
+            response = self._create_completion(self._build_messages(query, packed_documents))
+        record_usage(CHAT_MODEL, getattr(response, "usage", None))
+        return response.choices[0].message.content.strip()
+
+    @staticmethod
+    def _degraded_answer():
+        """Result of generate_answer_cached when answers are unavailable"""
+        return {"answer": None, "cached": False, "context_tokens": 0, "degraded": True}
+
+    def get_cached_answer(self, search_results):
+        """Look up a cached answer for search results"""
+        if not self.answer_cache or search_results.get("query_embedding") is None:
+            return None
+        return self.answer_cache.lookup(search_results["query_embedding"], search_results["ids"][0])
 
-            return response.choices[0].message.content.strip()
+    def cache_answer(self, search_results, answer):
+        """Store a successfully generated answer for search results"""
+        if self.answer_cache and search_results.get("query_embedding") is not None and not answer.startswith("❌"):
+            self.answer_cache.store(search_results["query_embedding"], search_results["ids"][0], answer)
+
+    def generate_answer_cached(self, query, search_results):
+        """Generate an answer, reusing the cached answer of a similar query
+
+        A cached answer is used only if the query embeddings are similar
+        enough and the same documents were retrieved. Returns a dict with the
+        answer, whether it was cached, the context tokens sent to the model
+        and whether the answer was skipped (answer None, degraded True)
+        because the completion circuit breaker is open.
+        """
+        answer = self.get_cached_answer(search_results)
+        if answer is not None:
+            return {"answer": answer, "cached": True, "context_tokens": 0, "degraded": False}
+
+        packed = self.pack_context(search_results['documents'][0])
+        try:
+            answer = self._complete_answer(query, packed["documents"])
+        except CircuitOpenError:
+            return self._degraded_answer()
         except Exception as e:
-            error_msg = str(e)
-            if "quota" in error_msg.lower() or "429" in error_msg:
-                return "❌ OpenAI API quota exceeded. Please check your billing and usage limits at https://platform.openai.com/account/billing"
-            else:
-                print(f"Error generating answer: {e}")
-                return "❌ Sorry, I couldn't generate an answer due to an API error."
-    
+            answer = self._answer_error_message(e)
+        self.cache_answer(search_results, answer)
+        return {"answer": answer, "cached": False, "context_tokens": packed["tokens"], "degraded": False}
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """Run a blocking call (ChromaDB, SQLite) in the bounded thread pool"""
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the current context so timing spans reach the request
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(context.run, func, *args, **kwargs)
+        )
+
+    async def _acreate_embeddings(self, texts):
+        """Async version of _create_embeddings"""
+        with span("embedding"):
+            return await self.embedder.aembed(texts)
+
+    async def _acreate_completion(self, messages, stream=False):
+        """Async version of _create_completion (optionally streaming)"""
+        return await acall_with_retries(
+            self.async_client.chat.completions.create,
+            limiter=self.chat_limiter,
+            breaker=self.chat_breaker,
+            tokens=self._completion_tokens(messages),
+            model=CHAT_MODEL,
+            messages=messages,
+            max_tokens=ANSWER_MAX_TOKENS,
+            temperature=0.7,
+            stream=stream,
+            **self.request_retry_settings,
+            # The last streamed chunk then carries the token usage
+            **({"stream_options": {"include_usage": True}} if stream else {})
+        )
+
+    async def aget_embedding(self, text):
+        """Async version of get_embedding"""
+        if self.embedding_cache:
+            cached = await self._run_blocking(self.embedding_cache.get, self.embedding_model, text)
+            if cached is not None:
+                return cached
+
+        try:
+            async with self._openai_semaphore:
+                embedding = (await self._acreate_embeddings([text]))[0]
+        except Exception as e:
+            print(f"Error getting embedding: {e}")
+            return None
+
+        if self.embedding_cache:
+            await self._run_blocking(self.embedding_cache.set, self.embedding_model, text, embedding)
+        return embedding
+
+    async def asearch_documents(self, query, n_results=3, mode=None, where=None):
+        """Async version of search_documents"""
+        mode = mode or self.retrieval_mode
+        print(f"Searching for: '{query}'")
+
+        query_embedding = None
+        if mode != "lexical":
+            query_embedding = await self.aget_embedding(query)
+            if not query_embedding:
+                print("❌ Could not generate embedding for query (likely due to API quota or connection issues), "
+                      "falling back to lexical search")
+
+        results = await self._run_blocking(self._retrieve, query, query_embedding, n_results, mode, where)
+
+        return results
+
+    async def aget_embeddings(self, texts):
+        """Async version of get_embeddings"""
+        if self.embedding_cache:
+            embeddings = await self._run_blocking(self.embedding_cache.get_many, self.embedding_model, texts)
+        else:
+            embeddings = [None] * len(texts)
+
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            async with self._openai_semaphore:
+                fetched = await self._acreate_embeddings([texts[i] for i in missing])
+            for i, embedding in zip(missing, fetched):
+                embeddings[i] = embedding
+            if self.embedding_cache:
+                await self._run_blocking(
+                    self.embedding_cache.set_many, self.embedding_model, [texts[i] for i in missing], fetched
+                )
+
+        return embeddings
+
+    async def asearch_documents_batch(self, queries, n_results=3, mode=None, where=None):
+        """Async version of search_documents_batch"""
+        mode = mode or self.retrieval_mode
+        print(f"Searching for {len(queries)} queries...")
+
+        query_embeddings = [None] * len(queries)
+        if mode != "lexical":
+            try:
+                query_embeddings = await self.aget_embeddings(queries)
+            except Exception as e:
+                print(f"❌ Could not generate embeddings for queries ({e}), falling back to lexical search")
+
+        return await self._run_blocking(
+            self._retrieve_batch, queries, query_embeddings, n_results, mode, where
+        )
+
+    async def awarmup(self, queries, n_results=3, connections=4):
+        """Warm the request path before serving traffic
+
+        Opens `connections` pooled connections to the embeddings API (and
+        loads a local model), embeds the queries into the embedding cache and
+        runs one retrieval per query, so the index is paged in. Returns
+        warmup statistics; failures are counted, not raised.
+        """
+        start_time = time.perf_counter()
+        stats = {"queries": len(queries), "connections": 0, "errors": 0}
+
+        # Concurrent requests make the pool open one connection each
+        opened = await asyncio.gather(
+            *(self._acreate_embeddings(["warmup"]) for _ in range(connections)), return_exceptions=True
+        )
+        stats["connections"] = sum(1 for result in opened if not isinstance(result, Exception))
+        stats["errors"] += len(opened) - stats["connections"]
+
+        if queries:
+            try:
+                await self.asearch_documents_batch(queries, n_results=n_results)
+                for mode in ("vector", "lexical"):
+                    # Single-query path of the other stages (cached embeddings, no API calls)
+                    await self.asearch_documents(queries[0], n_results=n_results, mode=mode)
+            except Exception as e:
+                print(f"Warmup retrieval failed: {e}")
+                stats["errors"] += 1
+
+        stats["seconds"] = round(time.perf_counter() - start_time, 3)
+        return stats
+
+    async def agenerate_answer(self, query, context_documents):
+        """Async version of generate_answer"""
+        packed = self.pack_context(context_documents)
+        try:
+            return await self._acomplete_answer(query, packed["documents"])
+        except Exception as e:
+            return self._answer_error_message(e)
+
+    async def _acomplete_answer(self, query, packed_documents):
+        """Async version of _complete_answer"""
+        with span("generation"):
+            async with self._openai_semaphore:
+                response = await self._acreate_completion(self._build_messages(query, packed_documents))
+        record_usage(CHAT_MODEL, getattr(response, "usage", None))
+        return response.choices[0].message.content.strip()
+
+    async def agenerate_answer_cached(self, query, search_results):
+        """Async version of generate_answer_cached"""
+        answer = self.get_cached_answer(search_results)
+        if answer is not None:
+            return {"answer": answer, "cached": True, "context_tokens": 0, "degraded": False}
+
+        packed = self.pack_context(search_results['documents'][0])
+        try:
+            answer = await self._acomplete_answer(query, packed["documents"])
+        except CircuitOpenError:
+            return self._degraded_answer()
+        except Exception as e:
+            answer = self._answer_error_message(e)
+        self.cache_answer(search_results, answer)
+        return {"answer": answer, "cached": False, "context_tokens": packed["tokens"], "degraded": False}
+
+    async def astream_answer(self, query, context_documents, packed=False):
+        """Stream the answer as text deltas from a streaming completion
+
+        With packed=True the documents are the "documents" of a pack_context
+        result and are used as they are. Raises AnswerStreamError if the
+        completion fails, possibly after some deltas were already yielded.
+        """
+        if not packed:
+            context_documents = self.pack_context(context_documents)["documents"]
+        try:
+            with span("generation"):
+                async with self._openai_semaphore:
+                    stream = await self._acreate_completion(
+                        self._build_messages(query, context_documents), stream=True
+                    )
+                    async for chunk in stream:
+                        record_usage(CHAT_MODEL, getattr(chunk, "usage", None))
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise AnswerStreamError(self._answer_error_message(e)) from e
+
     def ask_question(self, query):
         """Main method to ask a question using RAG"""
         print(f"\n{'='*50}")
@@ -160,9 +1170,12 @@ Answer:"""
 
         # Step 3: Generate answer
         print("\nGenerating answer...")
-        answer = self.generate_answer(query, search_results['documents'][0])
+        result = self.generate_answer_cached(query, search_results)
+        answer = result["answer"]
+        if result["degraded"]:
+            answer = "❌ Answers are temporarily unavailable because of OpenAI API errors. See the retrieved documents above."
 
-        print(f"\nAnswer: {answer}")
+        print(f"\nAnswer{' (cached)' if result['cached'] else ''}: {answer}")
         return answer
 
 
@@ -0,0 +1,134 @@
+"""
+Structured recipe attributes extracted at ingestion
+Sauce type, dish pairings, main ingredients and hot/cold serving are stored as
+scalar metadata, so queries can be narrowed with vector store filters
+"""
+
+from bm25_index import WORD, stem, tokenize
+
+# Bumped when extraction changes, so stored records get their attributes rewritten
+ATTRIBUTES_VERSION = 1
+
+# Sauce types by base, checked in order (the first match wins); each entry
+# lists groups of words that must all appear
+SAUCE_TYPES = [
+    ("pomidorowy", [["pomidor", "pomidory", "pomidorów", "ketchup", "ketchupu", "passata"]]),
+    ("zasmazka", [["mąka", "mąki", "mąką"], ["masło", "masła", "maśle", "masłem"]]),
+    ("jogurtowy", [["jogurt", "jogurtu", "jogurtem", "jogurtowy"]]),
+    ("smietanowy", [["śmietana", "śmietany", "śmietaną", "śmietanowy"]]),
+    ("oliwny", [["oliwa", "oliwy", "oliwie", "oliwą", "pesto"]]),
+    ("slodko_kwasny", [["cukier", "cukru", "miód", "miodu", "miodem"], ["ocet", "octu", "octem"]]),
+    ("musztardowy", [["musztarda", "musztardy", "musztardą", "musztardowy"]]),
+]
+
+# Matched as exact word forms: stems would confuse e.g. "warzywa" with "bulion warzywny"
+PAIRINGS = {
+    "ryby": ["ryba", "ryby", "ryb", "rybą", "rybny", "łosoś", "łososia", "dorsz", "dorsza"],
+    "makaron": ["makaron", "makaronu", "makaronem", "spaghetti", "penne"],
+    "mieso": ["mięso", "mięsa", "mięsem", "grill", "grilla", "grillowanego", "kurczak", "kurczaka",
+              "schab", "schabu", "kotlet", "kotletów", "stek", "steków", "klopsików"],
+    "salatki": ["sałatka", "sałatki", "sałatek"],
+    "ziemniaki": ["ziemniaki", "ziemniaków", "frytki", "frytek"],
+    "warzywa": ["warzywa", "warzyw"],
+    "pierogi": ["pierogi", "pierogów", "placki", "placków"],
+}
+
+INGREDIENTS = {
+    "czosnek": ["czosnek", "czosnku", "czosnkiem", "czosnkowy"],
+    "jogurt": ["jogurt", "jogurtu", "jogurtem"],
+    "smietana": ["śmietana", "śmietany", "śmietaną"],
+    "pomidory": ["pomidory", "pomidorów", "pomidorami"],
+    "cebula": ["cebula", "cebulę", "cebulą", "cebuli", "cebulowy"],
+    "koperek": ["koperek", "koperku", "koperkiem", "koperkowy"],
+    "musztarda": ["musztarda", "musztardy", "musztardą"],
+    "miod": ["miód", "miodu", "miodem"],
+    "maslo": ["masło", "masła", "maśle", "masłem"],
+    "maka": ["mąka", "mąki", "mąką"],
+    "pieczarki": ["pieczarki", "pieczarek", "pieczarkami", "pieczarkowy"],
+    "chili": ["chili"],
+    "bazylia": ["bazylia", "bazylii", "bazylią"],
+    "cytryna": ["cytryna", "cytryny", "cytryną", "cytrynowy"],
+    "ser": ["ser", "sera", "serowy", "parmezan", "parmezanu"],
+    "oliwa": ["oliwa", "oliwy", "oliwie", "oliwą"],
+    "ogorek": ["ogórek", "ogórka", "ogórkowy"],
+    "papryka": ["papryka", "papryki", "papryką", "paprykowy"],
+    "chrzan": ["chrzan", "chrzanu", "chrzanowy"],
+    "bulion": ["bulion", "bulionu"],
+}
+
+# Cooking steps; recipes without any are served cold
+HOT_WORDS = ["gotuj", "gotować", "duś", "dusić", "podsmaż", "smaż", "rozpuść", "zagotuj",
+             "podgrzej", "rondel", "rondelku", "rondlu"]
+
+SERVED_VALUES = ("hot", "cold")
+
+
+def _stems(words):
+    """Stems of a word list, matched against the tokenized recipe text"""
+    return {stem(word.lower()) for word in words}
+
+
+_SAUCE_TYPE_STEMS = [(name, [_stems(group) for group in groups]) for name, groups in SAUCE_TYPES]
+_PAIRING_WORDS = {name: set(words) for name, words in PAIRINGS.items()}
+_INGREDIENT_STEMS = {name: _stems(words) for name, words in INGREDIENTS.items()}
+_HOT_STEMS = _stems(HOT_WORDS)
+
+FILTER_VALUES = {
+    "sauce_type": [name for name, _ in SAUCE_TYPES] + ["inny"],
+    "served": list(SERVED_VALUES),
+    "pairing": list(PAIRINGS),
+    "ingredient": list(INGREDIENTS),
+}
+
+
+def extract_attributes(text):
+    """Extract recipe attributes as flat metadata
+
+    Pairings and ingredients are stored as pairing_<name> / ingredient_<name>
+    flags (only the present ones), plus comma-separated lists for display.
+    """
+    words = set(WORD.findall(text.lower()))
+    terms = set(tokenize(text))
+    sauce_type = next(
+        (name for name, groups in _SAUCE_TYPE_STEMS if all(terms & group for group in groups)), "inny"
+    )
+    pairings = [name for name, forms in _PAIRING_WORDS.items() if words & forms]
+    ingredients = [name for name, stems in _INGREDIENT_STEMS.items() if terms & stems]
+
+    attributes = {
+        "attributes_version": ATTRIBUTES_VERSION,
+        "sauce_type": sauce_type,
+        "served": "hot" if terms & _HOT_STEMS else "cold",
+        "pairings": ",".join(pairings),
+        "ingredients": ",".join(ingredients),
+    }
+    attributes.update({f"pairing_{name}": True for name in pairings})
+    attributes.update({f"ingredient_{name}": True for name in ingredients})
+    return attributes
+
+
+def build_where(filters):
+    """Build a vector store where clause from {filter: value} (None if empty)
+
+    Filters are sauce_type, served, pairing and ingredient; ingredient may
+    list several comma-separated ingredients that must all be present.
+    Raises ValueError for unknown filters or values.
+    """
+    conditions = []
+    for name, value in (filters or {}).items():
+        if value is None:
+            continue
+        if name not in FILTER_VALUES:
+            raise ValueError(f"Unknown filter: {name}")
+        values = [v.strip() for v in value.split(",")] if name == "ingredient" else [value]
+        for v in values:
+            if v not in FILTER_VALUES[name]:
+                raise ValueError(f"'{name}' must be one of: {', '.join(FILTER_VALUES[name])}")
+            if name in ("sauce_type", "served"):
+                conditions.append({name: v})
+            else:
+                conditions.append({f"{name}_{v}": True})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
@@ -0,0 +1,98 @@
+"""
+Reranking of retrieved candidates with a cheap local scorer
+Retrieval over-fetches candidates, a scorer rescores them against the query
+and only the best few go into the prompt
+"""
+
+from bm25_index import tokenize
+from metrics import span
+
+# Weights of the lexical overlap features
+TERM_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.5
+LEAD_WEIGHT = 0.25
+
+# Query terms found in this many leading tokens count as a title match
+LEAD_TOKENS = 12
+
+
+class LexicalOverlapScorer:
+    """Scores documents by how well they cover the query's terms
+
+    Features: share of query terms in the document, share of query bigrams
+    (terms in the same order) and share of query terms near the start of
+    the document, where recipe names are.
+    """
+
+    def score(self, query, documents):
+        """Relevance score for each document, higher is better"""
+        query_terms = tokenize(query)
+        if not query_terms:
+            return [0.0] * len(documents)
+        query_set = set(query_terms)
+        query_bigrams = set(zip(query_terms, query_terms[1:]))
+
+        scores = []
+        for document in documents:
+            terms = tokenize(document)
+            term_set = set(terms)
+            score = TERM_WEIGHT * len(query_set & term_set) / len(query_set)
+            if query_bigrams:
+                bigrams = set(zip(terms, terms[1:]))
+                score += BIGRAM_WEIGHT * len(query_bigrams & bigrams) / len(query_bigrams)
+            score += LEAD_WEIGHT * len(query_set & set(terms[:LEAD_TOKENS])) / len(query_set)
+            scores.append(score)
+        return scores
+
+
+class CrossEncoderScorer:
+    """Scores (query, document) pairs with a sentence-transformers cross-encoder on CPU"""
+
+    def __init__(self, model_name="cross-encoder/mmarco-mMiniLMv2-L12-H384-v1", max_length=256):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError(
+                "The cross-encoder reranker requires sentence-transformers (pip install sentence-transformers)"
+            ) from e
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+
+    def score(self, query, documents):
+        """Relevance score for each document, higher is better"""
+        if not documents:
+            return []
+        return [float(score) for score in self.model.predict([(query, document) for document in documents])]
+
+
+def create_scorer(name="lexical", **kwargs):
+    """Create a rerank scorer by name ("lexical" or "cross-encoder")"""
+    if name == "lexical":
+        return LexicalOverlapScorer()
+    if name == "cross-encoder":
+        return CrossEncoderScorer(**kwargs)
+    raise ValueError(f"Unknown rerank scorer: {name}")
+
+
+class Reranker:
+    """Reorders retrieved candidates with a scorer
+
+    Any object with a score(query, documents) method can be used as the
+    scorer. At most max_candidates candidates are scored per query, which
+    bounds the cost of reranking.
+    """
+
+    def __init__(self, scorer, max_candidates=20):
+        self.scorer = scorer
+        self.max_candidates = max_candidates
+
+    def rerank(self, query, results, n_results):
+        """Rescore single-query results in ChromaDB's format and keep the best n_results"""
+        ids = results["ids"][0][:self.max_candidates]
+        with span("rerank"):
+            scores = self.scorer.score(query, results["documents"][0][:len(ids)])
+        # Stable sort, so ties keep their retrieval order
+        order = sorted(range(len(ids)), key=lambda i: -scores[i])[:n_results]
+        return {
+            key: [[results[key][0][i] for i in order]]
+            for key in ("ids", "documents", "metadatas", "distances")
+        }
@@ -9,7 +9,10 @@ import os
 
 def main():
     """Run the FastAPI server"""
-    print("🍝 Starting Sauce Recipe RAG API Server...")
+    # Worker processes; the index is synced by one of them and shared read-only
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+
+    print(f"🍝 Starting Sauce Recipe RAG API Server ({workers} worker{'s' if workers != 1 else ''})...")
     print("📚 Loading sauce recipes and initializing RAG system...")
     print("🌐 Server will be available at: http://localhost:8000")
     print("📖 API Documentation: http://localhost:8000/docs")
@@ -24,7 +27,7 @@ def main():
             "api:app",
             host="0.0.0.0",
             port=8000,
-            reload=True,
+            workers=workers,
             log_level="info"
         )
     except KeyboardInterrupt:
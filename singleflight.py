@@ -0,0 +1,49 @@
+"""
+Single-flight request coalescing
+Concurrent callers with the same key share one in-flight computation
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self):
+        """Create an empty group of in-flight calls"""
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls = {}
+
+    def _forget(self, key, task):
+        """Remove a finished call so the next caller starts a new one"""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key, func, *args, **kwargs):
+        """Run func(*args, **kwargs), or wait for the running call with this key
+
+        The call runs in its own task, so a caller that disconnects does not
+        cancel the computation for the others. Results and exceptions are
+        shared with every caller.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        """In-flight and coalescing counters"""
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0
+        }
@@ -0,0 +1,42 @@
+"""Popular query counts saved by several workers are merged"""
+
+import threading
+
+from query_log import QueryLog
+
+
+def test_save_from_two_logs_keeps_both_counts(tmp_path):
+    path = str(tmp_path / "query_log.json")
+    first, second = QueryLog(path=path), QueryLog(path=path)
+    for _ in range(3):
+        first.record("Jak zrobić sos czosnkowy?")
+    for _ in range(2):
+        second.record("Jaki sos pasuje do ryby?")
+    second.record("Jak zrobić sos czosnkowy?")
+
+    # Save at the same time, as workers do on shutdown
+    threads = [threading.Thread(target=log.save) for log in (first, second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert QueryLog(path=path)._read() == {"Jak zrobić sos czosnkowy?": 4, "Jaki sos pasuje do ryby?": 2}
+
+
+def test_concurrent_saves_do_not_lose_counts(tmp_path):
+    path = str(tmp_path / "query_log.json")
+    logs = [QueryLog(path=path) for _ in range(8)]
+
+    def record_and_save(log):
+        for _ in range(20):
+            log.record("sos")
+            log.save()
+
+    threads = [threading.Thread(target=record_and_save, args=(log,)) for log in logs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert QueryLog(path=path)._read() == {"sos": 160}
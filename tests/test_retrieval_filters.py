@@ -0,0 +1,59 @@
+"""Filtered retrieval does not list every matching id on the hybrid path"""
+
+import numpy as np
+import pytest
+
+from bm25_index import BM25Index
+from rag_system import SimpleRAGSystem
+from vector_store import NumpyVectorStore
+
+
+RECORDS = [
+    ("cold-garlic", "Sos czosnkowy z jogurtem, podawany na zimno", {"served": "cold"}),
+    ("hot-garlic", "Sos czosnkowy na maśle, podawany na ciepło", {"served": "hot"}),
+    ("cold-dill", "Sos koperkowy ze śmietaną, podawany na zimno", {"served": "cold"}),
+    ("hot-tomato", "Sos pomidorowy do makaronu, podawany na ciepło", {"served": "hot"}),
+]
+
+
+@pytest.fixture
+def rag(tmp_path):
+    store = NumpyVectorStore(path=str(tmp_path / "vector_index"))
+    rng = np.random.default_rng(0)
+    store.upsert(
+        ids=[record_id for record_id, _, _ in RECORDS],
+        embeddings=rng.standard_normal((len(RECORDS), 8)).tolist(),
+        documents=[document for _, document, _ in RECORDS],
+        metadatas=[metadata for _, _, metadata in RECORDS]
+    )
+    bm25_index = BM25Index()
+    bm25_index.add_documents([record_id for record_id, _, _ in RECORDS], [document for _, document, _ in RECORDS])
+
+    # Only the attributes used by retrieval, no OpenAI client
+    system = SimpleRAGSystem.__new__(SimpleRAGSystem)
+    system.store = store
+    system.bm25_index = bm25_index
+    system.chunk_max_tokens = 0
+    system.reranker = None
+    return system
+
+
+def test_hybrid_filtered_search_does_not_list_matching_ids(rag, monkeypatch):
+    def get_ids(where):
+        raise AssertionError("get_ids called on the hybrid filtered path")
+
+    monkeypatch.setattr(rag.store, "get_ids", get_ids)
+    query_embedding = np.ones(8).tolist()
+
+    results = rag._retrieve("sos czosnkowy", query_embedding, 4, "hybrid", where={"served": "cold"})
+
+    assert results["ids"][0]
+    assert all(metadata["served"] == "cold" for metadata in results["metadatas"][0])
+    assert "hot-garlic" not in results["ids"][0]
+
+
+def test_lexical_filtered_search_only_returns_matching_records(rag):
+    results = rag._retrieve("sos czosnkowy", None, 4, "lexical", where={"served": "hot"})
+
+    assert results["ids"][0][0] == "hot-garlic"
+    assert all(metadata["served"] == "hot" for metadata in results["metadatas"][0])
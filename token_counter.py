@@ -0,0 +1,60 @@
+"""
+Token counting helpers for OpenAI models
+Uses tiktoken (in requirements.txt) and falls back to a character-based
+estimate, with a warning, when it is not installed or its encoding cannot be
+loaded
+"""
+
+import logging
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+# Polish text averages roughly 3 characters per token with the cl100k encoding
+CHARS_PER_TOKEN = 3
+
+_encodings = {}
+_fallback_warned = False
+
+logger = logging.getLogger(__name__)
+
+
+def _warn_fallback(reason):
+    """Warn once that token counts are estimates"""
+    global _fallback_warned
+    if not _fallback_warned:
+        _fallback_warned = True
+        logger.warning(f"{reason}; token counts are estimated as {CHARS_PER_TOKEN} characters per token, "
+                       f"so context budgets and rate limits are approximate")
+
+
+def _get_encoding(model):
+    """Get (and cache) the tiktoken encoding for a model, None if it cannot be loaded"""
+    if model not in _encodings:
+        try:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # The encoding files are downloaded on first use
+            _warn_fallback(f"tiktoken could not load the encoding for {model} ({e})")
+            _encodings[model] = None
+    return _encodings[model]
+
+
+def count_tokens(text, model="text-embedding-ada-002"):
+    """Count (or estimate) the number of tokens in a text"""
+    if not text:
+        return 0
+    if TIKTOKEN_AVAILABLE:
+        encoding = _get_encoding(model)
+        if encoding is not None:
+            return len(encoding.encode(text))
+    else:
+        _warn_fallback("tiktoken is not installed")
+    return max(1, -(-len(text) // CHARS_PER_TOKEN))
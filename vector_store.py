@@ -0,0 +1,690 @@
+"""
+Vector store backends for the RAG system
+ChromaDB (default) and a local in-process NumPy index share the same interface
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+from quantization import create_quantizer, load_quantizer
+
+
+def normalize_rows(matrix):
+    """Scale each row of a matrix to unit length"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def check_writable(store):
+    """Raise if a store was opened read-only"""
+    if store.read_only:
+        raise RuntimeError("The vector store was opened read-only")
+
+
+def matches_where(metadata, where):
+    """Check metadata against a ChromaDB-style where clause
+
+    Supports {key: value}, {key: {"$eq" | "$ne" | "$in" | "$nin" | "$gt" |
+    "$gte" | "$lt" | "$lte": value}} and "$and" / "$or" lists.
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, expected in condition.items():
+            if operator == "$eq":
+                ok = value == expected
+            elif operator == "$ne":
+                ok = value != expected
+            elif operator == "$in":
+                ok = value in expected
+            elif operator == "$nin":
+                ok = value not in expected
+            elif operator in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                ok = {
+                    "$gt": value > expected, "$gte": value >= expected,
+                    "$lt": value < expected, "$lte": value <= expected
+                }[operator]
+            else:
+                raise ValueError(f"Unsupported where operator: {operator}")
+            if not ok:
+                return False
+    return True
+
+
+def empty_results(n_queries):
+    """Query results without any matches, in ChromaDB's format"""
+    return {
+        "ids": [[] for _ in range(n_queries)],
+        "documents": [[] for _ in range(n_queries)],
+        "metadatas": [[] for _ in range(n_queries)],
+        "distances": [[] for _ in range(n_queries)]
+    }
+
+
+class ChromaVectorStore:
+    """Vector store backed by a persistent ChromaDB collection
+
+    A read-only store never writes and requires the collection to exist.
+    Collection calls are serialized, as ChromaDB's telemetry batching is not
+    thread-safe and fails concurrent queries.
+    """
+
+    def __init__(self, path="./chroma", name="sauce_recipes", read_only=False):
+        import chromadb
+
+        self.read_only = read_only
+        self.chroma_client = chromadb.PersistentClient(path=path)
+        self._lock = threading.Lock()
+
+        # Get or create collection (get_or_create_collection would overwrite
+        # the stored metadata, including the corpus fingerprint)
+        try:
+            self.collection = self.chroma_client.get_collection(name=name)
+        except ValueError:
+            if read_only:
+                raise
+            self.collection = self.chroma_client.create_collection(
+                name=name,
+                metadata={"description": "A collection of Polish sauce recipes"}
+            )
+
+    @property
+    def metadata(self):
+        """Collection-level metadata"""
+        return dict(self.collection.metadata or {})
+
+    def set_metadata(self, metadata):
+        """Replace the collection-level metadata"""
+        check_writable(self)
+        self.collection.modify(metadata=metadata)
+
+    def count(self):
+        """Number of stored records"""
+        return self.collection.count()
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        """Insert or replace records"""
+        check_writable(self)
+        with self._lock:
+            self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def update_metadatas(self, ids, metadatas):
+        """Replace the metadata of existing records, keeping their embeddings
+
+        collection.update merges metadata and cannot drop keys, so the
+        records are upserted again with their stored embeddings.
+        """
+        check_writable(self)
+        with self._lock:
+            stored = self.collection.get(ids=ids, include=["embeddings", "documents"])
+            replacements = dict(zip(ids, metadatas))
+            self.collection.upsert(
+                ids=stored["ids"],
+                embeddings=stored["embeddings"],
+                documents=stored["documents"],
+                metadatas=[replacements[record_id] for record_id in stored["ids"]]
+            )
+
+    def delete(self, ids):
+        """Delete records by id"""
+        check_writable(self)
+        with self._lock:
+            self.collection.delete(ids=ids)
+
+    def get_metadatas(self, ids=None, limit=None, offset=None):
+        """Get ids and metadatas (no documents or embeddings)"""
+        with self._lock:
+            if ids is not None:
+                return self.collection.get(ids=ids, include=["metadatas"])
+            return self.collection.get(include=["metadatas"], limit=limit, offset=offset)
+
+    def get_documents(self, ids=None, limit=None, offset=None):
+        """Get ids, documents and metadatas (no embeddings)"""
+        with self._lock:
+            if ids is not None:
+                return self.collection.get(ids=ids, include=["documents", "metadatas"])
+            return self.collection.get(include=["documents", "metadatas"], limit=limit, offset=offset)
+
+    def get_ids(self, where):
+        """Ids of the records whose metadata matches a where clause"""
+        with self._lock:
+            return self.collection.get(where=where, include=[])["ids"]
+
+    def query(self, query_embeddings, n_results=3, where=None):
+        """Find the nearest records for each query embedding, optionally filtered by metadata"""
+        with self._lock:
+            return self.collection.query(query_embeddings=query_embeddings, n_results=n_results, where=where)
+
+    def persist(self, compact=True):
+        """ChromaDB persists every write, nothing to do"""
+
+
+class NumpyVectorStore:
+    """In-process vector store using a memory-mapped float32 matrix
+
+    Vectors are normalized on write, so a query is a single matrix-vector
+    product followed by argpartition. Distances are squared L2 distances
+    between unit vectors (2 - 2 * cosine), matching ChromaDB's default space.
+    With ivf_clusters > 0 an inverted-file index is trained on persist and
+    queries only scan the nprobe closest clusters. With quantization "int8"
+    or "pq" compact codes are built on persist: queries scan the codes and
+    rescore a shortlist of rescore_candidates rows with the exact vectors, so
+    only those rows of the memory-mapped matrix are read. A read-only store
+    never writes, so several processes can share the memory-mapped matrix.
+    persist(compact=False) appends changed records to a journal instead of
+    rewriting the whole index, for checkpoints during long loads.
+    """
+
+    def __init__(self, path="./vector_index", ivf_clusters=0, nprobe=8, read_only=False,
+                 quantization="none", pq_subspaces=16, rescore_candidates=50):
+        self.path = path
+        self.ivf_clusters = ivf_clusters
+        self.nprobe = nprobe
+        self.read_only = read_only
+        self.quantization = quantization
+        self.pq_subspaces = pq_subspaces
+        self.rescore_candidates = rescore_candidates
+        if not read_only:
+            os.makedirs(path, exist_ok=True)
+
+        self._vectors_path = os.path.join(path, "vectors.npy")
+        self._records_path = os.path.join(path, "records.json")
+        self._ivf_path = os.path.join(path, "ivf.npz")
+        self._codes_path = os.path.join(path, "codes.npz")
+        self._journal_path = os.path.join(path, "journal.jsonl")
+        self._journal_vectors_path = os.path.join(path, "journal.f32")
+
+        self._metadata = {"description": "A collection of Polish sauce recipes"}
+        self.ids, self.documents, self.metadatas = [], [], []
+        self.vectors = None
+        # Matrix with spare rows that self.vectors is a view of, while writing
+        self._buffer = None
+        self._index = {}
+        self._centroids = None
+        self._assignments = None
+        self._quantizer = None
+        self._codes = None
+        # Rows by metadata value, per key used in a where clause: key -> {value: set of rows}
+        self._postings = {}
+        self._posting_arrays = {}
+        self._dirty = False
+        # Rows changed since the last write, and whether rows were deleted (no journaling then)
+        self._changed_rows = set()
+        self._rows_deleted = False
+        self._lock = threading.RLock()
+        self._load()
+        if not read_only:
+            # Build indexes enabled for an existing index and drop disabled ones
+            self.persist()
+
+    def _load(self):
+        """Load records, memory-map the vector matrix and replay the journal"""
+        if os.path.exists(self._records_path):
+            self._load_records()
+        self._replay_journal()
+
+    def _load_records(self):
+        """Load the records and indexes of the last full write"""
+        with open(self._records_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        self._metadata = records["metadata"]
+        self.ids = records["ids"]
+        self.documents = records["documents"]
+        self.metadatas = records["metadatas"]
+        if self.ids:
+            self.vectors = np.load(self._vectors_path, mmap_mode="r")
+        if self.ivf_clusters > 0 and os.path.exists(self._ivf_path):
+            ivf = np.load(self._ivf_path)
+            # Assignments written before rows were added with IVF turned off are stale
+            if len(ivf["assignments"]) == len(self.ids):
+                self._centroids = ivf["centroids"]
+                self._assignments = ivf["assignments"]
+        if self.quantization != "none" and os.path.exists(self._codes_path):
+            codes = np.load(self._codes_path)
+            if str(codes["kind"]) == self.quantization:
+                quantizer = load_quantizer(self.quantization, codes)
+                # Codes written before rows were added (or for other settings) are rebuilt
+                if (len(codes["codes"]) == len(self.ids) and self.vectors is not None
+                        and quantizer.dim == self.vectors.shape[1]
+                        and (self.quantization != "pq" or quantizer.n_subspaces == self.pq_subspaces)):
+                    self._quantizer = quantizer
+                    self._codes = codes["codes"]
+        self._index = {record_id: row for row, record_id in enumerate(self.ids)}
+
+    def _replay_journal(self):
+        """Apply the records journaled since the last full write"""
+        if not os.path.exists(self._journal_path):
+            return
+        journal_vectors = np.fromfile(self._journal_vectors_path, dtype=np.float32)
+        ids, vectors, documents, metadatas = [], [], [], []
+        with open(self._journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A write cut short by a crash
+                    continue
+                ids.append(entry["id"])
+                vectors.append(journal_vectors[entry["offset"]:entry["offset"] + entry["dim"]])
+                documents.append(entry["document"])
+                metadatas.append(entry["metadata"])
+        if ids:
+            self._write_rows(ids, np.stack(vectors), documents, metadatas)
+        # Folded into the main files by the next full write
+        self._dirty = True
+
+    def _append_journal(self):
+        """Append the rows changed since the last write to the journal
+
+        Vectors go to a raw float32 file first; each record line points at
+        its vector, so a write cut short never misaligns the two files.
+        """
+        rows = sorted(self._changed_rows)
+        dim = self.vectors.shape[1]
+        with open(self._journal_vectors_path, "ab") as f:
+            start = f.tell() // 4
+            np.ascontiguousarray(self.vectors[rows], dtype=np.float32).tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self._journal_path, "a", encoding="utf-8") as f:
+            f.write("".join(
+                json.dumps({
+                    "id": self.ids[row], "offset": start + i * dim, "dim": dim,
+                    "document": self.documents[row], "metadata": self.metadatas[row]
+                }, ensure_ascii=False) + "\n"
+                for i, row in enumerate(rows)
+            ))
+            f.flush()
+            os.fsync(f.fileno())
+        self._changed_rows = set()
+
+    @property
+    def metadata(self):
+        """Collection-level metadata"""
+        return dict(self._metadata)
+
+    def set_metadata(self, metadata):
+        """Replace the collection-level metadata"""
+        check_writable(self)
+        with self._lock:
+            self._metadata = dict(metadata)
+            self._dirty = True
+            self.persist()
+
+    def count(self):
+        """Number of stored records"""
+        return len(self.ids)
+
+    def memory_stats(self):
+        """Bytes of the float32 matrix and of the quantized codes scanned by queries"""
+        with self._lock:
+            return {
+                "quantization": self.quantization if self._codes is not None else "none",
+                "vector_bytes": int(self.vectors.nbytes) if self.vectors is not None else 0,
+                "code_bytes": int(self._codes.nbytes) if self._codes is not None else 0
+            }
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        """Insert or replace records (kept in memory until persist)"""
+        check_writable(self)
+        with self._lock:
+            self._write_rows(ids, normalize_rows(np.asarray(embeddings, dtype=np.float32)), documents, metadatas)
+
+    def _grow(self, n_rows, dim):
+        """Make self.vectors n_rows long, doubling the spare capacity as needed
+
+        The first write copies the read-only memory map into memory.
+        """
+        current = self.vectors if self.vectors is not None else np.empty((0, dim), dtype=np.float32)
+        if self._buffer is None or len(self._buffer) < n_rows:
+            self._buffer = np.empty((max(n_rows, 2 * len(current), 1024), dim), dtype=np.float32)
+            self._buffer[:len(current)] = current
+        self.vectors = self._buffer[:n_rows]
+
+    def _write_rows(self, ids, vectors, documents, metadatas):
+        """Insert or replace records with normalized vectors (lock must be held)"""
+        rows = []
+        for record_id, document, metadata in zip(ids, documents, metadatas):
+            row = self._index.get(record_id)
+            if row is None:
+                row = self._index[record_id] = len(self.ids)
+                self.ids.append(record_id)
+                self.documents.append(document)
+                self.metadatas.append(metadata)
+                self._update_postings(row, None, metadata)
+            else:
+                self.documents[row] = document
+                self._update_postings(row, self.metadatas[row], metadata)
+                self.metadatas[row] = metadata
+            rows.append(row)
+        if not rows:
+            return
+        self._grow(len(self.ids), vectors.shape[1])
+        self.vectors[rows] = vectors
+        self._changed_rows.update(rows)
+        self._centroids = None
+        self._codes = None
+        self._dirty = True
+
+    def update_metadatas(self, ids, metadatas):
+        """Replace the metadata of existing records, keeping their vectors"""
+        check_writable(self)
+        with self._lock:
+            for record_id, metadata in zip(ids, metadatas):
+                row = self._index.get(record_id)
+                if row is not None:
+                    self._update_postings(row, self.metadatas[row], metadata)
+                    self.metadatas[row] = metadata
+                    self._changed_rows.add(row)
+            self._dirty = True
+
+    def delete(self, ids):
+        """Delete records by id (kept in memory until persist)"""
+        check_writable(self)
+        with self._lock:
+            rows = {self._index[record_id] for record_id in ids if record_id in self._index}
+            if not rows:
+                return
+            keep = [row for row in range(len(self.ids)) if row not in rows]
+            self.vectors = np.array(self.vectors[keep])
+            self._buffer = None
+            self.ids = [self.ids[row] for row in keep]
+            self.documents = [self.documents[row] for row in keep]
+            self.metadatas = [self.metadatas[row] for row in keep]
+            self._index = {record_id: row for row, record_id in enumerate(self.ids)}
+            # Rows were renumbered
+            self._postings = {}
+            self._posting_arrays = {}
+            self._centroids = None
+            self._codes = None
+            self._changed_rows = set()
+            self._rows_deleted = True
+            self._dirty = True
+
+    def get_metadatas(self, ids=None, limit=None, offset=None):
+        """Get ids and metadatas (no documents or embeddings)"""
+        with self._lock:
+            if ids is not None:
+                rows = [self._index[record_id] for record_id in ids if record_id in self._index]
+            else:
+                start = offset or 0
+                end = start + limit if limit is not None else len(self.ids)
+                rows = range(start, min(end, len(self.ids)))
+            return {
+                "ids": [self.ids[row] for row in rows],
+                "metadatas": [self.metadatas[row] for row in rows]
+            }
+
+    def get_documents(self, ids=None, limit=None, offset=None):
+        """Get ids, documents and metadatas (no embeddings)"""
+        with self._lock:
+            if ids is not None:
+                rows = [self._index[record_id] for record_id in ids if record_id in self._index]
+            else:
+                start = offset or 0
+                end = start + limit if limit is not None else len(self.ids)
+                rows = range(start, min(end, len(self.ids)))
+            return {
+                "ids": [self.ids[row] for row in rows],
+                "documents": [self.documents[row] for row in rows],
+                "metadatas": [self.metadatas[row] for row in rows]
+            }
+
+    def _update_postings(self, row, old_metadata, new_metadata):
+        """Move a row between the postings of the indexed keys"""
+        for key, postings in self._postings.items():
+            if old_metadata and key in old_metadata:
+                postings[old_metadata[key]].discard(row)
+                self._posting_arrays.pop((key, old_metadata[key]), None)
+            if key in new_metadata:
+                postings.setdefault(new_metadata[key], set()).add(row)
+                self._posting_arrays.pop((key, new_metadata[key]), None)
+
+    def _posting(self, key, value):
+        """Sorted rows whose metadata has key == value (indexing the key on first use)"""
+        if key not in self._postings:
+            postings = {}
+            for row, metadata in enumerate(self.metadatas):
+                if key in metadata:
+                    postings.setdefault(metadata[key], set()).add(row)
+            self._postings[key] = postings
+        rows = self._posting_arrays.get((key, value))
+        if rows is None:
+            rows = np.array(sorted(self._postings[key].get(value, ())), dtype=np.int64)
+            self._posting_arrays[(key, value)] = rows
+        return rows
+
+    def _where_rows(self, where):
+        """Sorted rows matching a where clause
+
+        Equality and $in conditions are answered from the postings, other
+        operators by checking the metadata of every row.
+        """
+        matches = []
+        for key, condition in where.items():
+            if key == "$and":
+                rows = self._where_rows(condition[0])
+                for clause in condition[1:]:
+                    rows = np.intersect1d(rows, self._where_rows(clause), assume_unique=True)
+                matches.append(rows)
+                continue
+            if key == "$or":
+                rows = np.empty(0, dtype=np.int64)
+                for clause in condition:
+                    rows = np.union1d(rows, self._where_rows(clause))
+                matches.append(rows)
+                continue
+
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, expected in condition.items():
+                if operator == "$eq" and expected is not None:
+                    matches.append(self._posting(key, expected))
+                elif operator == "$in" and None not in expected:
+                    rows = np.empty(0, dtype=np.int64)
+                    for value in expected:
+                        rows = np.union1d(rows, self._posting(key, value))
+                    matches.append(rows)
+                else:
+                    clause = {key: {operator: expected}}
+                    matches.append(np.array(
+                        [row for row, metadata in enumerate(self.metadatas) if matches_where(metadata, clause)],
+                        dtype=np.int64
+                    ))
+
+        if not matches:
+            return np.arange(len(self.ids), dtype=np.int64)
+        rows = matches[0]
+        for other in matches[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def get_ids(self, where):
+        """Ids of the records whose metadata matches a where clause"""
+        with self._lock:
+            return [self.ids[row] for row in self._where_rows(where)]
+
+    def _train_ivf(self):
+        """Cluster the vectors with spherical k-means for the IVF index"""
+        n_clusters = min(self.ivf_clusters, len(self.ids))
+        rng = np.random.default_rng(0)
+        sample_size = min(len(self.ids), n_clusters * 256)
+        sample = np.asarray(self.vectors[rng.choice(len(self.ids), sample_size, replace=False)])
+        centroids = sample[rng.choice(sample_size, n_clusters, replace=False)]
+        for _ in range(10):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(n_clusters):
+                members = sample[labels == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = normalize_rows(centroids)
+
+        # Assign all vectors in blocks to keep memory bounded
+        assignments = np.empty(len(self.ids), dtype=np.int32)
+        for start in range(0, len(self.ids), 65536):
+            block = np.asarray(self.vectors[start:start + 65536])
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        self._centroids = centroids.astype(np.float32)
+        self._assignments = assignments
+
+    def _needs_ivf(self):
+        """Whether the IVF index is enabled but missing or stale"""
+        return self.ivf_clusters > 0 and self._centroids is None and bool(self.ids)
+
+    def _save_ivf(self):
+        """Write the IVF index, or remove the file when there is none"""
+        if self._centroids is None:
+            if os.path.exists(self._ivf_path):
+                os.remove(self._ivf_path)
+            return
+        tmp_path = self._ivf_path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self._centroids, assignments=self._assignments)
+        os.replace(tmp_path, self._ivf_path)
+
+    def _needs_codes(self):
+        """Whether quantization is enabled but the codes are missing or stale"""
+        return self.quantization != "none" and self._codes is None and bool(self.ids)
+
+    def _build_codes(self):
+        """Train the quantizer on the vectors and encode all of them"""
+        quantizer = create_quantizer(self.quantization, n_subspaces=self.pq_subspaces)
+        quantizer.train(self.vectors)
+        self._codes = quantizer.encode(self.vectors)
+        self._quantizer = quantizer
+        tmp_path = self._codes_path + ".tmp.npz"
+        np.savez(tmp_path, kind=self.quantization, codes=self._codes, **quantizer.state())
+        os.replace(tmp_path, self._codes_path)
+
+    def persist(self, compact=True):
+        """Write pending changes to disk and re-open the matrix as a memory map
+
+        With compact=False only the records changed since the last write are
+        appended to the journal (unless records were deleted), so a checkpoint
+        costs as much as the records it adds; indexes are built by the next
+        full write.
+        """
+        with self._lock:
+            if not compact and not self._rows_deleted:
+                if self._changed_rows:
+                    self._append_journal()
+                return
+            ivf_changed = self._dirty or (self._centroids is None and os.path.exists(self._ivf_path))
+            if self._needs_ivf():
+                self._train_ivf()
+                ivf_changed = True
+            if ivf_changed:
+                self._save_ivf()
+            if self.quantization == "none" and os.path.exists(self._codes_path):
+                os.remove(self._codes_path)
+            if not self._dirty:
+                if self._needs_codes():
+                    self._build_codes()
+                return
+
+            if self.ids:
+                tmp_path = self._vectors_path + ".tmp.npy"
+                np.save(tmp_path, np.ascontiguousarray(self.vectors, dtype=np.float32))
+                os.replace(tmp_path, self._vectors_path)
+
+            tmp_path = self._records_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "metadata": self._metadata,
+                    "ids": self.ids,
+                    "documents": self.documents,
+                    "metadatas": self.metadatas
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, self._records_path)
+            for journal_path in (self._journal_path, self._journal_vectors_path):
+                if os.path.exists(journal_path):
+                    os.remove(journal_path)
+
+            self.vectors = np.load(self._vectors_path, mmap_mode="r") if self.ids else None
+            self._buffer = None
+            self._changed_rows = set()
+            self._rows_deleted = False
+            self._dirty = False
+            if self._needs_codes():
+                self._build_codes()
+
+    def _candidate_rows(self, query, centroids, assignments):
+        """Rows to scan for a query (all rows unless the IVF index is in use)"""
+        if centroids is None:
+            return None
+        nprobe = min(self.nprobe, len(centroids))
+        clusters = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        return np.flatnonzero(np.isin(assignments, clusters))
+
+    def _shortlist(self, query, rows, quantizer, codes, n_results):
+        """Best rows by approximate score, to be rescored with the exact vectors"""
+        scores = quantizer.scores(codes if rows is None else codes[rows], query)
+        k = min(max(n_results, self.rescore_candidates), len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        # Sorted rows read the memory-mapped matrix sequentially
+        return np.sort(top if rows is None else rows[top])
+
+    def query(self, query_embeddings, n_results=3, where=None):
+        """Find the nearest records for each query embedding, optionally filtered by metadata
+
+        With a where clause only the matching rows are scored.
+        """
+        # Take a consistent snapshot, then search without holding the lock
+        with self._lock:
+            if not self.ids:
+                return empty_results(len(query_embeddings))
+            vectors, ids, documents, metadatas = self.vectors, self.ids, self.documents, self.metadatas
+            centroids, assignments = self._centroids, self._assignments
+            quantizer, codes = self._quantizer, self._codes
+            allowed = self._where_rows(where) if where else None
+
+        queries = normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query in queries:
+            rows = self._candidate_rows(query, centroids, assignments)
+            if allowed is not None:
+                rows = allowed if rows is None else np.intersect1d(rows, allowed, assume_unique=True)
+            if codes is not None:
+                rows = self._shortlist(query, rows, quantizer, codes, n_results)
+            if rows is None:
+                scores = vectors @ query
+            else:
+                scores = vectors[rows] @ query
+
+            k = min(n_results, len(scores))
+            if k < len(scores):
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top])]
+            top_rows = top if rows is None else rows[top]
+
+            results["ids"].append([ids[row] for row in top_rows])
+            results["documents"].append([documents[row] for row in top_rows])
+            results["metadatas"].append([metadatas[row] for row in top_rows])
+            results["distances"].append([float(2 - 2 * scores[i]) for i in top])
+        return results
+
+
+def create_vector_store(backend="chroma", **kwargs):
+    """Create a vector store backend by name ("chroma" or "numpy")"""
+    if backend == "chroma":
+        return ChromaVectorStore(**kwargs)
+    if backend == "numpy":
+        return NumpyVectorStore(**kwargs)
+    raise ValueError(f"Unknown vector store backend: {backend}")